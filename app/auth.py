@@ -1,10 +1,87 @@
-from fastapi import HTTPException, Header
-from typing import Optional
+from fastapi import HTTPException, Header, Query
+from typing import Any, Dict, Optional
 from datetime import datetime, timezone, timedelta
-import httpx
+import asyncio
+import hashlib
+import time
+import weakref
+from contextlib import asynccontextmanager
+import jwt
 from app.database import supabase
+from app.repository import repository
+from app.redis_client import get_redis
+from app.services.http_client import get_http_client
 from app.models.user import User
 from app.config import settings
+from app.utils.cache import TTLCache
+
+# Resolved users keyed by token hash, so most requests skip Supabase entirely
+_user_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+_jwks_client = None
+
+# Google access tokens kept until they are due for refresh, keyed by user ID
+_google_token_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=3600)
+_refresh_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+def _get_jwks_client() -> jwt.PyJWKClient:
+    """Lazily create the JWKS client; it caches signing keys between requests"""
+    global _jwks_client
+    if _jwks_client is None:
+        _jwks_client = jwt.PyJWKClient(settings.SUPABASE_JWKS_URL, cache_keys=True, lifespan=settings.JWKS_CACHE_TTL)
+    return _jwks_client
+
+async def verify_token_locally(token: str) -> Optional[dict]:
+    """
+    Verify a Supabase access token's signature and expiry without a network hop.
+    Returns the claims, or None when no verification key is configured for its algorithm.
+    Raises jwt.InvalidTokenError for invalid or expired tokens.
+    """
+    algorithm = jwt.get_unverified_header(token).get("alg")
+    if algorithm == "HS256":
+        if not settings.SUPABASE_JWT_SECRET:
+            return None
+        key = settings.SUPABASE_JWT_SECRET
+    elif algorithm in ("RS256", "ES256") and settings.SUPABASE_JWKS_URL:
+        # Only fetches the JWKS on a cache miss
+        signing_key = await asyncio.to_thread(_get_jwks_client().get_signing_key_from_jwt, token)
+        key = signing_key.key
+    else:
+        return None
+    
+    return jwt.decode(token, key, algorithms=[algorithm], audience="authenticated")
+
+async def authenticate_token(token: str) -> User:
+    """Resolve a Supabase access token to its user (cached per token until expiry)"""
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    
+    cached_user = _user_cache.get(cache_key)
+    if cached_user:
+        return cached_user
+    
+    try:
+        # Verify token locally, falling back to Supabase when no key is configured
+        claims = await verify_token_locally(token)
+        if claims is not None:
+            user_id = claims["sub"]
+            cache_ttl = claims["exp"] - time.time()
+        else:
+            response = await asyncio.to_thread(supabase.auth.get_user, token)
+            if not response.user:
+                raise HTTPException(status_code=401, detail="Invalid token")
+            user_id = response.user.id
+            cache_ttl = None
+        
+        # Get user from database
+        user_record = await repository.get_user(user_id)
+        if not user_record:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        user = User(**user_record)
+        # Never cache a user past the token's expiry
+        _user_cache.set(cache_key, user, ttl=cache_ttl)
+        return user
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Authentication failed: {str(e)}")
 
 async def get_current_user(authorization: Optional[str] = Header(None)) -> User:
     """Dependency to get current user from JWT token"""
@@ -14,103 +91,202 @@ async def get_current_user(authorization: Optional[str] = Header(None)) -> User:
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authorization format")
     
-    token = authorization.split(" ")[1]
-    
+    return await authenticate_token(authorization.split(" ")[1])
+
+async def get_stream_user(authorization: Optional[str] = Header(None), token: Optional[str] = Query(None)) -> User:
+    """
+    Dependency for streaming endpoints: browsers' EventSource cannot set headers,
+    so the token may also be passed as a query parameter.
+    """
+    if authorization:
+        return await get_current_user(authorization)
+    if not token:
+        raise HTTPException(status_code=401, detail="Authorization header or token missing")
+    return await authenticate_token(token)
+
+def _parse_expiry(expires_at: Optional[str]) -> Optional[datetime]:
+    """Convert an ISO 8601 expires_at into an aware datetime (None if missing or unparseable)"""
+    if not expires_at:
+        return None
     try:
-        # Verify token with Supabase
-        response = supabase.auth.get_user(token)
-        if not response.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        # Get user from database
-        user_response = supabase.table("users").select("*").eq("id", response.user.id).execute()
-        if not user_response.data:
-            raise HTTPException(status_code=404, detail="User not found")
+        # Handle different datetime formats
+        if expires_at.endswith('Z'):
+            expiry_time = datetime.fromisoformat(expires_at.replace("Z", "+00:00"))
+        else:
+            expiry_time = datetime.fromisoformat(expires_at)
         
-        return User(**user_response.data[0])
+        # Ensure expiry_time is timezone-aware
+        if expiry_time.tzinfo is None:
+            expiry_time = expiry_time.replace(tzinfo=timezone.utc)
+        return expiry_time
+    except (ValueError, TypeError) as e:
+        # If datetime parsing fails, assume token is valid and continue
+        print(f"Warning: Could not parse expiry time '{expires_at}': {e}")
+        return None
+
+def _cache_google_token(user_id: str, access_token: str, expiry_time: Optional[datetime]):
+    """Keep a token in memory until it is due for refresh"""
+    if expiry_time:
+        ttl = (expiry_time - datetime.now(timezone.utc)).total_seconds() - settings.GOOGLE_TOKEN_REFRESH_MARGIN
+    else:
+        ttl = None
+    _google_token_cache.set(user_id, access_token, ttl=ttl)
+
+def _needs_refresh(expiry_time: Optional[datetime]) -> bool:
+    return bool(expiry_time) and datetime.now(timezone.utc) + timedelta(seconds=settings.GOOGLE_TOKEN_REFRESH_MARGIN) >= expiry_time
+
+def _get_refresh_lock(user_id: str) -> asyncio.Lock:
+    lock = _refresh_locks.get(user_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _refresh_locks[user_id] = lock
+    return lock
+
+@asynccontextmanager
+async def _distributed_lock(name: str):
+    """
+    Redis lock shared by all workers. Yields True if another holder had it first.
+    Falls back to no cross-worker locking when Redis is unavailable.
+    """
+    lock = None
+    contended = False
+    try:
+        lock = get_redis().lock(name, timeout=settings.TOKEN_REFRESH_LOCK_TIMEOUT,
+                                blocking_timeout=settings.TOKEN_REFRESH_LOCK_TIMEOUT)
+        if not await lock.acquire(blocking=False):
+            contended = True
+            if not await lock.acquire():
+                lock = None
     except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Authentication failed: {str(e)}")
+        print(f"Warning: Redis lock {name} unavailable: {e}")
+        lock = None
+    try:
+        yield contended
+    finally:
+        if lock is not None:
+            try:
+                await lock.release()
+            except Exception as e:
+                print(f"Warning: Failed to release Redis lock {name}: {e}")
+
+def _is_permanent_refresh_failure(response) -> bool:
+    """invalid_grant means the refresh token was revoked, expired or is otherwise unusable"""
+    try:
+        return response.status_code in (400, 401) and response.json().get("error") == "invalid_grant"
+    except ValueError:
+        return False
 
 async def get_valid_google_token(user_id: str) -> str:
     """Get a valid Google access token, refreshing if necessary"""
     try:
+        cached_token = _google_token_cache.get(user_id)
+        if cached_token:
+            return cached_token
+        
         # Fetch current integration from Supabase
-        integration_response = supabase.table("user_integrations")\
-            .select("access_token, expires_at")\
-            .eq("user_id", user_id)\
-            .eq("provider", "google")\
-            .execute()
+        integration = await repository.get_integration(user_id, "google", "access_token, refresh_token, expires_at, needs_reconnect")
 
-        if not integration_response.data:
+        if not integration:
             raise ValueError("Google integration not found")
+        if integration.get("needs_reconnect"):
+            raise ValueError("Google integration needs to be reconnected")
 
-        integration = integration_response.data[0]
         access_token = integration["access_token"]
-        expires_at = integration.get("expires_at")
+        expiry_time = _parse_expiry(integration.get("expires_at"))
 
-        if expires_at:
-            # Convert ISO 8601 string to aware datetime
-            try:
-                # Handle different datetime formats
-                if expires_at.endswith('Z'):
-                    expiry_time = datetime.fromisoformat(expires_at.replace("Z", "+00:00"))
-                else:
-                    expiry_time = datetime.fromisoformat(expires_at)
-                
-                # Ensure expiry_time is timezone-aware
-                if expiry_time.tzinfo is None:
-                    expiry_time = expiry_time.replace(tzinfo=timezone.utc)
-                
-                if datetime.now(timezone.utc) + timedelta(minutes=5) >= expiry_time:
-                    # Token is expired or about to expire
-                    return await refresh_google_token(user_id)
-            except (ValueError, TypeError) as e:
-                # If datetime parsing fails, assume token is valid and continue
-                print(f"Warning: Could not parse expiry time '{expires_at}': {e}")
-                pass
+        if _needs_refresh(expiry_time):
+            # Token is expired or about to expire
+            return await refresh_google_token(user_id, integration.get("refresh_token"))
 
+        _cache_google_token(user_id, access_token, expiry_time)
         return access_token
 
     except Exception as e:
         raise RuntimeError(f"Failed to get valid Google token: {str(e)}")
 
-async def refresh_google_token(user_id: str) -> str:
-    """Refresh Google access token using refresh token"""
+async def refresh_google_token(user_id: str, refresh_token: Optional[str] = None, force: bool = False) -> str:
+    """
+    Refresh Google access token using refresh token.
+    Single-flight per user: concurrent callers in this process share one refresh,
+    and a Redis lock stops other workers from refreshing the same token at once.
+    With force, a cached token that is not yet due for refresh is refreshed anyway.
+    """
     try:
-        # Get user's Google integration with refresh token
-        integration_response = supabase.table("user_integrations").select("access_token, refresh_token, expires_at").eq("user_id", user_id).eq("provider", "google").execute()
-        
-        if not integration_response.data:
-            raise Exception("Google integration not found")
-        
-        integration = integration_response.data[0]
-        refresh_token = integration.get("refresh_token")
-        
-        if not refresh_token:
-            raise Exception("No refresh token available")
-        
-        # Exchange refresh token for new access token
-        token_response = httpx.post("https://oauth2.googleapis.com/token", data={
-            "client_id": settings.GOOGLE_CLIENT_ID,
-            "client_secret": settings.GOOGLE_CLIENT_SECRET,
-            "refresh_token": refresh_token,
-            "grant_type": "refresh_token"
-        })
-        
-        if token_response.status_code != 200:
-            raise Exception("Failed to refresh Google token")
-        
-        token_data = token_response.json()
-        new_access_token = token_data["access_token"]
-        new_expires_at = (datetime.now(timezone.utc) + timedelta(seconds=token_data.get("expires_in", 3600))).isoformat()
-        
-        # Update the database with new token
-        supabase.table("user_integrations").update({
-            "access_token": new_access_token,
-            "expires_at": new_expires_at
-        }).eq("user_id", user_id).eq("provider", "google").execute()
-        
-        return new_access_token
+        async with _get_refresh_lock(user_id):
+            # Another coroutine may have refreshed while we waited for the lock
+            cached_token = _google_token_cache.get(user_id)
+            if cached_token and not force:
+                return cached_token
+            
+            async with _distributed_lock(f"lock:google-token-refresh:{user_id}") as contended:
+                if contended or not refresh_token:
+                    # Re-read the row: another worker may have just refreshed it
+                    integration = await repository.get_integration(user_id, "google", "access_token, refresh_token, expires_at")
+                    if not integration:
+                        raise Exception("Google integration not found")
+                    
+                    expiry_time = _parse_expiry(integration.get("expires_at"))
+                    if contended and not _needs_refresh(expiry_time):
+                        _cache_google_token(user_id, integration["access_token"], expiry_time)
+                        return integration["access_token"]
+                    refresh_token = integration.get("refresh_token")
+                
+                if not refresh_token:
+                    raise Exception("No refresh token available")
+                
+                # Exchange refresh token for new access token
+                token_response = await get_http_client().post("https://oauth2.googleapis.com/token", data={
+                    "client_id": settings.GOOGLE_CLIENT_ID,
+                    "client_secret": settings.GOOGLE_CLIENT_SECRET,
+                    "refresh_token": refresh_token,
+                    "grant_type": "refresh_token"
+                })
+                
+                if token_response.status_code != 200:
+                    if _is_permanent_refresh_failure(token_response):
+                        # Retrying cannot succeed; stop refreshing until the user reconnects Google
+                        await repository.update_integration(user_id, "google", {"needs_reconnect": True})
+                        raise Exception("Google refresh token was revoked or expired; reconnect Google")
+                    raise Exception("Failed to refresh Google token")
+                
+                token_data = token_response.json()
+                new_access_token = token_data["access_token"]
+                new_expiry_time = datetime.now(timezone.utc) + timedelta(seconds=token_data.get("expires_in", 3600))
+                
+                # Update the database with new token
+                await repository.update_integration(user_id, "google", {
+                    "access_token": new_access_token,
+                    "expires_at": new_expiry_time.isoformat()
+                })
+                
+                _cache_google_token(user_id, new_access_token, new_expiry_time)
+                return new_access_token
         
     except Exception as e:
-        raise Exception(f"Failed to refresh Google token: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Failed to refresh Google token: {str(e)}")
+
+async def refresh_expiring_google_tokens(window_seconds: int = None, max_concurrency: int = None) -> Dict[str, int]:
+    """
+    Proactively refresh Google tokens that expire within the window, in concurrent batches,
+    so workflow runs almost always find a fresh token.
+    """
+    window_seconds = window_seconds or settings.TOKEN_REFRESH_WINDOW
+    semaphore = asyncio.Semaphore(max_concurrency or settings.TOKEN_REFRESH_CONCURRENCY)
+    expires_before = (datetime.now(timezone.utc) + timedelta(seconds=window_seconds)).isoformat()
+    integrations = await repository.get_expiring_integrations("google", expires_before)
+    
+    async def refresh_one(integration: Dict[str, Any]) -> bool:
+        async with semaphore:
+            try:
+                await refresh_google_token(integration["user_id"], integration["refresh_token"], force=True)
+                return True
+            except Exception as e:
+                print(f"Failed to refresh Google token for user {integration['user_id']}: {str(e)}")
+                return False
+    
+    results = await asyncio.gather(*(refresh_one(integration) for integration in integrations))
+    return {
+        "expiring": len(integrations),
+        "refreshed": results.count(True),
+        "failed": results.count(False)
+    }
@@ -1,5 +1,6 @@
 from celery import Celery
 from app.config import settings
+from app.worker import resolve_worker_profile
 
 celery_app = Celery(
     "workflow_automation",
@@ -8,6 +9,23 @@ celery_app = Celery(
     include=['app.main_tasks']
 )
 
+# Adaptive mode replaces the fixed all-users poll with a frequent tick that
+# dispatches only the users whose next poll time has come
+if settings.POLL_DISPATCH_MODE == "adaptive":
+    poll_schedule = {
+        "dispatch-due-polls": {
+            "task": "app.main_tasks.dispatch_due_polls",
+            "schedule": settings.POLL_TICK_INTERVAL,
+        },
+    }
+else:
+    poll_schedule = {
+        "poll-notion-every-5-minutes": {
+            "task": "app.main_tasks.poll_notion_and_schedule_meetings",
+            "schedule": settings.POLL_INTERVAL,  # 5 minutes by default
+        },
+    }
+
 # Upstash-optimized configuration
 celery_app.conf.update(
     # Use Redis as both broker and result backend
@@ -29,8 +47,9 @@ celery_app.conf.update(
     task_acks_late=True,
     
     # Result settings
-    result_expires=3600,  # 1 hour
+    result_expires=settings.JOB_RESULT_EXPIRES,  # 1 hour by default
     task_ignore_result=False,
+    task_track_started=True,  # Report STARTED to job status polling
     
     # Connection settings for Upstash
     broker_connection_retry_on_startup=True,
@@ -38,15 +57,23 @@ celery_app.conf.update(
     broker_connection_max_retries=10,
     broker_connection_timeout=30,
     
-    # Windows-specific settings
-    worker_pool='solo',  # Use solo pool instead of prefork on Windows
-    worker_concurrency=1,
+    # Worker pool and concurrency (solo on Windows, prefork/threads on Linux)
+    **resolve_worker_profile(),
     
     # Beat schedule
     beat_schedule={
-        "poll-notion-every-5-minutes": {
-            "task": "app.main_tasks.poll_notion_and_schedule_meetings",
-            "schedule": 300.0,  # 5 minutes = 300 seconds
+        **poll_schedule,
+        "refresh-expiring-google-tokens": {
+            "task": "app.main_tasks.refresh_expiring_google_tokens",
+            "schedule": settings.TOKEN_REFRESH_INTERVAL,
+        },
+        "renew-calendar-watch-channels": {
+            "task": "app.main_tasks.renew_calendar_watch_channels",
+            "schedule": settings.GOOGLE_WATCH_RENEW_INTERVAL,
+        },
+        "maintain-log-partitions": {
+            "task": "app.main_tasks.maintain_log_partitions",
+            "schedule": settings.LOG_MAINTENANCE_INTERVAL,
         },
     }
 )
@@ -9,6 +9,20 @@ class Settings:
     SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
     SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
     
+    # Local JWT verification (HS256 secret, or JWKS for asymmetric signing keys)
+    SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+    SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL", f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else None)
+    JWKS_CACHE_TTL = int(os.getenv("JWKS_CACHE_TTL", "3600"))
+    AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+    AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+    
+    # Google token refresh
+    GOOGLE_TOKEN_REFRESH_MARGIN = int(os.getenv("GOOGLE_TOKEN_REFRESH_MARGIN", "300"))  # Refresh this many seconds before expiry
+    TOKEN_REFRESH_LOCK_TIMEOUT = int(os.getenv("TOKEN_REFRESH_LOCK_TIMEOUT", "30"))
+    TOKEN_REFRESH_INTERVAL = float(os.getenv("TOKEN_REFRESH_INTERVAL", "300"))  # Background refresher period
+    TOKEN_REFRESH_WINDOW = int(os.getenv("TOKEN_REFRESH_WINDOW", "900"))  # Refresh tokens expiring within this window
+    TOKEN_REFRESH_CONCURRENCY = int(os.getenv("TOKEN_REFRESH_CONCURRENCY", "10"))
+    
     # API Keys
     NOTION_CLIENT_ID = os.getenv("NOTION_CLIENT_ID")
     NOTION_CLIENT_SECRET = os.getenv("NOTION_CLIENT_SECRET")
@@ -18,6 +32,95 @@ class Settings:
     # App
     REDIS_CELERY_BROKER = os.getenv("REDIS_CELERY_BROKER", "redis://localhost:6379/0")
     REDIS_CELERY_BACKEND = os.getenv("REDIS_CELERY_BACKEND", "redis://localhost:6379/1")
+    REDIS_URL = os.getenv("REDIS_URL", REDIS_CELERY_BROKER)  # Locks, caches and pub/sub
+    
+    # Celery worker profile ("solo" on Windows, "prefork"/"threads" elsewhere)
+    CELERY_WORKER_POOL = os.getenv("CELERY_WORKER_POOL", "solo" if os.name == "nt" else "prefork")
+    CELERY_WORKER_CONCURRENCY = int(os.getenv("CELERY_WORKER_CONCURRENCY", "0"))  # 0 = pick from pool and CPU count
+    WORKER_TASK_TIMEOUT = float(os.getenv("WORKER_TASK_TIMEOUT", "1800"))  # Longest a task body may run on the worker loop
+    
+    # Shared HTTP client (connection pool used by all services)
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+    HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+    
+    # Polling fan-out
+    POLL_MAX_CONCURRENCY = int(os.getenv("POLL_MAX_CONCURRENCY", "20"))
+    POLL_USER_TIMEOUT = float(os.getenv("POLL_USER_TIMEOUT", "120"))
+    POLL_DISPATCH_MODE = os.getenv("POLL_DISPATCH_MODE", "inline")  # "inline", "sharded" or "adaptive"
+    POLL_SHARD_SIZE = int(os.getenv("POLL_SHARD_SIZE", "25"))
+    POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", "300"))  # Fallback polling; raise it when webhooks are on
+    
+    # Adaptive per-user polling (POLL_DISPATCH_MODE=adaptive): next poll times in a Redis sorted set
+    POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "60"))
+    POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "3600"))
+    POLL_ACTIVE_FACTOR = float(os.getenv("POLL_ACTIVE_FACTOR", "0.5"))  # Interval multiplier when a poll found work
+    POLL_BACKOFF_FACTOR = float(os.getenv("POLL_BACKOFF_FACTOR", "2"))  # Interval multiplier when idle or failing
+    POLL_JITTER = float(os.getenv("POLL_JITTER", "0.1"))  # +/- fraction of the interval
+    POLL_TICK_INTERVAL = float(os.getenv("POLL_TICK_INTERVAL", "15"))
+    POLL_LEASE_SECONDS = int(os.getenv("POLL_LEASE_SECONDS", "600"))  # A claimed user is due again if its run never reports back
+    POLL_DISPATCH_BATCH = int(os.getenv("POLL_DISPATCH_BATCH", "500"))
+    POLL_RESYNC_INTERVAL = int(os.getenv("POLL_RESYNC_INTERVAL", "300"))
+    
+    # Incremental Notion polling (last_edited_time watermarks)
+    NOTION_INCREMENTAL_POLLING = os.getenv("NOTION_INCREMENTAL_POLLING", "true").lower() == "true"
+    NOTION_WATERMARK_SKEW_SECONDS = int(os.getenv("NOTION_WATERMARK_SKEW_SECONDS", "120"))
+    
+    # Outbound rate limits (requests per second and burst, per provider and token)
+    NOTION_RATE_LIMIT = float(os.getenv("NOTION_RATE_LIMIT", "3"))
+    NOTION_RATE_BURST = int(os.getenv("NOTION_RATE_BURST", "3"))
+    GOOGLE_RATE_LIMIT = float(os.getenv("GOOGLE_RATE_LIMIT", "10"))
+    GOOGLE_RATE_BURST = int(os.getenv("GOOGLE_RATE_BURST", "10"))
+    DEFAULT_RATE_LIMIT = float(os.getenv("DEFAULT_RATE_LIMIT", "10"))
+    DEFAULT_RATE_BURST = int(os.getenv("DEFAULT_RATE_BURST", "10"))
+    RATE_LIMIT_BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "1"))
+    RATE_LIMIT_BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "30"))
+    RATE_LIMIT_MAX_RETRY_AFTER = float(os.getenv("RATE_LIMIT_MAX_RETRY_AFTER", "60"))
+    RATE_LIMIT_METRICS_INTERVAL = float(os.getenv("RATE_LIMIT_METRICS_INTERVAL", "10"))  # How often workers publish limiter state
+    RATE_LIMIT_METRICS_TTL = int(os.getenv("RATE_LIMIT_METRICS_TTL", "120"))  # Published state of an idle or dead worker expires
+    
+    # Google Calendar batch inserts (max 50 per batch request)
+    GOOGLE_BATCH_SIZE = min(int(os.getenv("GOOGLE_BATCH_SIZE", "50")), 50)
+    
+    # Per-run pipeline limits (concurrent requests per provider within one user's run)
+    GOOGLE_MAX_CONCURRENCY = int(os.getenv("GOOGLE_MAX_CONCURRENCY", "2"))
+    NOTION_MAX_CONCURRENCY = int(os.getenv("NOTION_MAX_CONCURRENCY", "3"))
+    
+    # Buffered execution log writer
+    LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "100"))
+    LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "2"))
+    LOG_QUEUE_MAXSIZE = int(os.getenv("LOG_QUEUE_MAXSIZE", "10000"))
+    LOG_OVERFLOW_POLICY = os.getenv("LOG_OVERFLOW_POLICY", "block")  # "block", "drop" or "spill"
+    LOG_BLOCK_TIMEOUT = float(os.getenv("LOG_BLOCK_TIMEOUT", "1"))
+    LOG_WRITE_TIMEOUT = float(os.getenv("LOG_WRITE_TIMEOUT", "5"))
+    LOG_SPOOL_PATH = os.getenv("LOG_SPOOL_PATH", "log_spool.jsonl")
+    LOG_SPOOL_REPLAY_INTERVAL = float(os.getenv("LOG_SPOOL_REPLAY_INTERVAL", "30"))
+    
+    # Log partition retention and archival
+    LOG_RETENTION_MONTHS = int(os.getenv("LOG_RETENTION_MONTHS", "6"))
+    LOG_PARTITIONS_AHEAD = int(os.getenv("LOG_PARTITIONS_AHEAD", "2"))
+    LOG_ARCHIVE_ENABLED = os.getenv("LOG_ARCHIVE_ENABLED", "true").lower() == "true"
+    LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "log_archive")
+    LOG_MAINTENANCE_INTERVAL = float(os.getenv("LOG_MAINTENANCE_INTERVAL", "86400"))  # Daily
+    
+    # Live workflow progress (Redis pub/sub, streamed over SSE)
+    PROGRESS_EVENTS_ENABLED = os.getenv("PROGRESS_EVENTS_ENABLED", "true").lower() == "true"
+    PROGRESS_PUBLISH_TIMEOUT = float(os.getenv("PROGRESS_PUBLISH_TIMEOUT", "1"))
+    PROGRESS_HEARTBEAT_INTERVAL = float(os.getenv("PROGRESS_HEARTBEAT_INTERVAL", "15"))
+    
+    # Manual workflow jobs (Celery results and their owners are kept this long)
+    JOB_RESULT_EXPIRES = int(os.getenv("JOB_RESULT_EXPIRES", "3600"))
+    
+    # Webhook triggers (Notion webhooks, Google Calendar push channels)
+    WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")  # Public HTTPS base URL of this API; push channels are off without it
+    NOTION_WEBHOOK_VERIFICATION_TOKEN = os.getenv("NOTION_WEBHOOK_VERIFICATION_TOKEN", "")
+    WEBHOOK_DEDUPE_TTL = int(os.getenv("WEBHOOK_DEDUPE_TTL", "86400"))
+    WEBHOOK_DEBOUNCE_SECONDS = int(os.getenv("WEBHOOK_DEBOUNCE_SECONDS", "10"))
+    GOOGLE_WATCH_TTL = int(os.getenv("GOOGLE_WATCH_TTL", "604800"))  # Google caps event channels at 7 days
+    GOOGLE_WATCH_RENEW_BEFORE = int(os.getenv("GOOGLE_WATCH_RENEW_BEFORE", "86400"))
+    GOOGLE_WATCH_RENEW_INTERVAL = float(os.getenv("GOOGLE_WATCH_RENEW_INTERVAL", "3600"))
     
     # OAuth Redirect URIs
     NOTION_REDIRECT_URI = os.getenv("NOTION_REDIRECT_URI", "http://localhost:8000/auth/notion/callback")
@@ -1,5 +1,34 @@
+import os
 from supabase import create_client, Client
 from app.config import settings
 
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-admin_supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+class ProcessLocalClient:
+    """
+    Supabase client created lazily once per process.
+    Celery prefork children get their own client (and HTTP connections)
+    instead of sharing the one inherited from the parent across the fork.
+    """
+    
+    def __init__(self, key: str):
+        self._key = key
+        self._client = None
+        self._pid = None
+    
+    def connect(self) -> Client:
+        if self._client is None or self._pid != os.getpid():
+            self._client = create_client(settings.SUPABASE_URL, self._key)
+            self._pid = os.getpid()
+        return self._client
+    
+    def __getattr__(self, name):
+        return getattr(self.connect(), name)
+
+supabase: Client = ProcessLocalClient(settings.SUPABASE_KEY)
+admin_supabase: Client = ProcessLocalClient(settings.SUPABASE_SERVICE_KEY)
+
+def init_clients():
+    """
+    Create this process's Supabase clients up front (called once per worker child).
+    """
+    supabase.connect()
+    admin_supabase.connect()
@@ -1,7 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import auth, workflows, health
+from app.routes import auth, workflows, health, webhooks
 from app.celery import celery_app
+from app.services.http_client import close_http_client
+from app.repository import repository
+from app.redis_client import close_redis
+from app.utils.log_sink import close_log_sink
 import os
 
 app = FastAPI(title="Workflow Automation API", version="1.0.0")
@@ -25,12 +29,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination of /workflows/logs
 )
 
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(workflows.router, prefix="/workflows", tags=["Workflows"])
 app.include_router(health.router, prefix="/health", tags=["Health"])
+app.include_router(webhooks.router, prefix="/webhooks", tags=["Webhooks"])
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Write buffered logs, then close pooled connections to Notion/Google and Supabase
+    await close_log_sink()
+    await close_http_client()
+    await repository.close()
+    await close_redis()
 
 @app.get("/")
 async def root():
@@ -1,98 +1,184 @@
 # Celery task management with factory pattern
+import asyncio
 from datetime import datetime
+from celery import chord
 from app.celery import celery_app
+from app.config import settings
 from app.tasks.task_factory import TaskFactory
-from app.database import supabase
+from app.repository import repository
 from app.utils.simple_logging import log_workflow_execution, log_error
+from app.utils.log_sink import request_log_flush
+from app.tasks.fan_out import get_eligible_user_ids, run_task_for_user, run_task_for_users, user_run_lock
+from app.tasks.calendar_watch import renew_watch_channels
+from app.tasks import poll_scheduler
+from app.worker import run_async
+from app.auth import refresh_expiring_google_tokens as refresh_expiring_tokens
+from app.utils import log_archive
+
+NOTION_TO_GOOGLE = ("notion_to_google", 1, "Notion to Google Meet")
+
+async def log_poll_summary(workflow_id: int, workflow_name: str, users_processed: int, meetings_processed: int):
+    """
+    Log the overall summary of a polling cycle.
+    """
+    await log_workflow_execution(
+        "system", 
+        workflow_id, 
+        workflow_name,
+        f"Workflow completed: {users_processed} users processed, {meetings_processed} meetings scheduled",
+        users_processed,
+        meetings_processed,
+        True
+    )
+    
+    request_log_flush()
+    print(f"✅ Workflow completed successfully. Users: {users_processed}, Meetings: {meetings_processed}")
 
 @celery_app.task
 def poll_notion_and_schedule_meetings():
     """
     Legacy task - now uses the new factory pattern.
     This maintains backward compatibility while using the new architecture.
+    
+    In "sharded" dispatch mode it only enumerates eligible users and fans
+    their runs out to the workers as chunks.
     """
-    import asyncio
+    if settings.POLL_DISPATCH_MODE == "sharded":
+        return dispatch_workflow_shards(*NOTION_TO_GOOGLE)
+    
+    task_type, workflow_id, workflow_name = NOTION_TO_GOOGLE
     
     async def process_workflow():
         try:
-            # Get all users with integrations
-            integrations = supabase.table("user_integrations").select("*").execute().data
-            print(f"Found {len(integrations)} integrations")
-            
-            # Group by user
-            user_map = {}
-            for integration in integrations:
-                user_id = integration["user_id"]
-                if user_id not in user_map:
-                    user_map[user_id] = {}
-                user_map[user_id][integration["provider"]] = integration
-            
-            # Process users with both Notion and Google
-            users_processed = 0
-            meetings_processed = 0
-            
-            for user_id, providers in user_map.items():
-                if "notion" in providers and "google" in providers:
-                    try:
-                        # Create task using factory
-                        task = TaskFactory.create_task("notion_to_google", 1, "Notion to Google Meet")
-                        if task:
-                            # Execute task
-                            result = await task.run_with_logging(user_id)
-                            
-                            if result.get("success", False):
-                                users_processed += 1
-                                meetings_processed += result.get("items_created", 0)
-                            else:
-                                print(f"Task failed for user {user_id}: {result.get('error', 'Unknown error')}")
-                        else:
-                            print(f"Failed to create task for user {user_id}")
-                            
-                    except Exception as e:
-                        print(f"Error processing user {user_id}: {str(e)}")
-                        log_error(user_id, 1, "trigger", "system", f"Failed to process user {user_id}", str(e))
-                        continue
+            # Process users with both Notion and Google concurrently
+            user_ids = await get_eligible_user_ids(workflow_id, ["notion", "google"])
+            summary = await run_task_for_users(task_type, workflow_id, workflow_name, user_ids)
             
             # Log overall summary
-            log_workflow_execution(
-                "system", 
-                1, 
-                "Notion to Google Meet",
-                f"Workflow completed: {users_processed} users processed, {meetings_processed} meetings scheduled",
-                users_processed,
-                meetings_processed,
-                True
-            )
-            
-            print(f"✅ Workflow completed successfully. Users: {users_processed}, Meetings: {meetings_processed}")
+            await log_poll_summary(workflow_id, workflow_name, summary["users_processed"], summary["meetings_processed"])
             
         except Exception as e:
             print(f"❌ Workflow failed with error: {str(e)}")
-            log_error("system", 1, "trigger", "system", "Workflow execution failed", str(e))
+            await log_error("system", workflow_id, "trigger", "system", "Workflow execution failed", str(e))
             raise
     
-    # Run the async function
-    asyncio.run(process_workflow())
+    # Run the async function on the worker's persistent event loop
+    run_async(process_workflow())
+
+def dispatch_workflow_shards(task_type: str, workflow_id: int, workflow_name: str):
+    """
+    Enqueue one shard task per chunk of eligible users, with a chord callback
+    that writes the overall summary once every shard has finished.
+    """
+    try:
+        user_ids = run_async(get_eligible_user_ids(workflow_id, ["notion", "google"]))
+    except Exception as e:
+        print(f"❌ Workflow dispatch failed with error: {str(e)}")
+        run_async(log_error("system", workflow_id, "trigger", "system", "Workflow dispatch failed", str(e)))
+        raise
+    
+    if not user_ids:
+        run_async(log_poll_summary(workflow_id, workflow_name, 0, 0))
+        return {"users": 0, "shards": 0}
+    
+    shard_size = settings.POLL_SHARD_SIZE
+    shards = [user_ids[i:i + shard_size] for i in range(0, len(user_ids), shard_size)]
+    chord(
+        execute_workflow_shard.s(task_type, workflow_id, workflow_name, shard) for shard in shards
+    )(summarize_workflow_shards.s(workflow_id, workflow_name))
+    
+    print(f"📤 Dispatched {len(user_ids)} users in {len(shards)} shards")
+    return {"users": len(user_ids), "shards": len(shards)}
+
+@celery_app.task
+def dispatch_due_polls():
+    """
+    Adaptive polling tick: enqueue a poll for each user whose next poll time has come.
+    Each user's interval adapts to how much work its recent polls found.
+    """
+    task_type, workflow_id, workflow_name = NOTION_TO_GOOGLE
+    
+    async def claim():
+        synced = await poll_scheduler.sync_scheduled_users(task_type, workflow_id)
+        if synced:
+            print(f"🗓️ Poll schedule resynced: {synced}")
+        return await poll_scheduler.claim_due_users(task_type)
+    
+    # A tick that cannot finish well before the next one is stuck
+    user_ids, lease_until = run_async(claim(), timeout=settings.POLL_TICK_INTERVAL * 4)
+    for user_id in user_ids:
+        execute_scheduled_poll.delay(task_type, workflow_id, workflow_name, user_id, lease_until)
+    
+    if user_ids:
+        print(f"📤 Dispatched {len(user_ids)} due polls")
+    return {"dispatched": len(user_ids)}
+
+@celery_app.task
+def execute_scheduled_poll(task_type: str, workflow_id: int, workflow_name: str, user_id: str, lease_until: float):
+    """
+    Poll one user, then reschedule them according to the outcome.
+    Skipped when the claim went stale while queued or another run for the user is in progress.
+    """
+    async def poll():
+        if not await poll_scheduler.start_claimed_poll(task_type, user_id, lease_until):
+            return {"skipped": "superseded"}
+        
+        async with user_run_lock(task_type, user_id) as acquired:
+            if acquired:
+                result = await run_task_for_user(task_type, workflow_id, workflow_name, user_id, settings.POLL_USER_TIMEOUT)
+        
+        if not acquired:
+            # The lock holder may be a webhook-triggered run, which never reschedules;
+            # keep the user's interval rather than leave them on the lease until it expires
+            try:
+                interval = await poll_scheduler.reschedule_user(task_type, user_id)
+            except Exception as e:
+                print(f"Warning: Failed to reschedule polling for user {user_id}: {str(e)}")
+                interval = None
+            return {"skipped": "already running", "next_interval": interval}
+        
+        try:
+            interval = await poll_scheduler.record_poll_result(task_type, user_id, result)
+        except Exception as e:
+            # The lease expires and the user is polled again; nothing is lost
+            print(f"Warning: Failed to reschedule polling for user {user_id}: {str(e)}")
+            interval = None
+        return {"success": result.get("success", False), "next_interval": interval}
+    
+    return run_async(poll())
+
+@celery_app.task
+def execute_workflow_shard(task_type: str, workflow_id: int, workflow_name: str, user_ids: list):
+    """
+    Run a workflow for one chunk of users and return its counters.
+    """
+    return run_async(run_task_for_users(task_type, workflow_id, workflow_name, user_ids))
+
+@celery_app.task
+def summarize_workflow_shards(shard_results: list, workflow_id: int, workflow_name: str):
+    """
+    Chord callback: aggregate shard counters into the system summary log.
+    """
+    users_processed = sum(result.get("users_processed", 0) for result in shard_results)
+    meetings_processed = sum(result.get("meetings_processed", 0) for result in shard_results)
+    run_async(log_poll_summary(workflow_id, workflow_name, users_processed, meetings_processed))
+    return {"users_processed": users_processed, "meetings_processed": meetings_processed}
 
 @celery_app.task
 def execute_workflow(workflow_type: str, user_id: str):
     """
     Generic workflow execution task using the factory pattern.
     """
-    import asyncio
-    
     async def run_workflow():
         try:
             # Get workflow info from database
-            workflow_response = supabase.table("workflows").select("*").eq("name", workflow_type).execute()
-            if not workflow_response.data:
+            workflow = await repository.get_workflow_by_name(workflow_type)
+            if not workflow:
                 print(f"❌ Workflow not found: {workflow_type}")
                 return
             
-            workflow = workflow_response.data[0]
-            
             # Create task using factory
-            task = TaskFactory.create_task(workflow_type.lower().replace(" ", "_"), workflow["id"], workflow["name"])
+            task = TaskFactory.create_task_for_workflow(workflow)
             if task:
                 # Execute task
                 result = await task.run_with_logging(user_id)
@@ -102,9 +188,93 @@ def execute_workflow(workflow_type: str, user_id: str):
                 
         except Exception as e:
             print(f"❌ Workflow execution failed: {str(e)}")
-            log_error(user_id, 1, "trigger", "system", f"Workflow execution failed: {workflow_type}", str(e))
+            await log_error(user_id, 1, "trigger", "system", f"Workflow execution failed: {workflow_type}", str(e))
             raise
     
-    # Run the async function
-    asyncio.run(run_workflow())
+    # Run the async function on the worker's persistent event loop
+    run_async(run_workflow())
+
+@celery_app.task(bind=True)
+def execute_user_workflow(self, workflow_id: int, user_id: str):
+    """
+    Run one workflow for one user on behalf of POST /workflows/execute.
+    Reports PROGRESS state with running counters while it runs; the return value is the job result.
+    """
+    job_id = self.request.id
+    counters = {"scheduled": 0, "failed": 0}
+    
+    async def report_progress(event: str, data: dict):
+        if event == "entry_scheduled":
+            counters["scheduled"] += 1
+        elif event == "entry_failed":
+            counters["failed"] += 1
+        elif event != "started":
+            return
+        meta = {"user_id": user_id, "workflow_id": workflow_id, "last_event": event, **counters}
+        # The result backend client is blocking; keep it off the event loop
+        await asyncio.to_thread(self.update_state, task_id=job_id, state="PROGRESS", meta=meta)
+    
+    async def run_workflow():
+        workflow = await repository.get_workflow(workflow_id)
+        if not workflow:
+            return {"success": False, "error": f"Workflow {workflow_id} not found"}
+        
+        task = TaskFactory.create_task_for_workflow(workflow)
+        if not task:
+            return {"success": False, "error": f"No task registered for workflow: {workflow['name']}"}
+        
+        task.progress_callback = report_progress
+        result = await task.run_with_logging(user_id)
+        return {
+            "workflow_id": workflow_id,
+            "workflow_name": workflow["name"],
+            "user_id": user_id,
+            **result
+        }
+    
+    return run_async(run_workflow())
 
+@celery_app.task(bind=True, max_retries=5)
+def execute_triggered_workflow(self, task_type: str, workflow_id: int, workflow_name: str, user_id: str):
+    """
+    Run one user's workflow in response to a webhook change event.
+    If a run for the user is already in progress it may have read Notion before
+    the change, so this one retries after it instead of being dropped.
+    """
+    async def run():
+        async with user_run_lock(task_type, user_id) as acquired:
+            if not acquired:
+                return None
+            return await run_task_for_user(task_type, workflow_id, workflow_name, user_id, settings.POLL_USER_TIMEOUT)
+    
+    result = run_async(run())
+    if result is None:
+        raise self.retry(countdown=settings.WEBHOOK_DEBOUNCE_SECONDS)
+    return result
+
+@celery_app.task
+def renew_calendar_watch_channels():
+    """
+    Open missing Google Calendar push channels and renew the ones about to expire.
+    """
+    result = run_async(renew_watch_channels())
+    print(f"📡 Calendar watch channels: {result}")
+    return result
+
+@celery_app.task
+def refresh_expiring_google_tokens():
+    """
+    Periodically refresh Google tokens before they expire, off the workflow hot path.
+    """
+    result = run_async(refresh_expiring_tokens())
+    print(f"🔑 Google token refresh: {result['refreshed']} refreshed, {result['failed']} failed")
+    return result
+
+@celery_app.task
+def maintain_log_partitions():
+    """
+    Create upcoming log partitions and archive/drop the ones past retention.
+    """
+    result = run_async(log_archive.maintain_log_partitions())
+    print(f"🗄️ Log maintenance: {result}")
+    return result
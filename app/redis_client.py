@@ -0,0 +1,26 @@
+import redis.asyncio as redis
+from app.config import settings
+from app.utils.loop_local import LoopLocal
+
+async def _close_redis(client: redis.Redis):
+    await client.close()
+
+_clients = LoopLocal(lambda: redis.from_url(settings.REDIS_URL, decode_responses=True), _close_redis)
+
+def get_redis() -> redis.Redis:
+    """
+    Get the async Redis client for the running event loop (locks, caches, pub/sub).
+    """
+    return _clients.get()
+
+async def close_redis():
+    """
+    Close the running event loop's Redis connections (call on shutdown).
+    """
+    await _clients.close()
+
+def reset_redis():
+    """
+    Forget clients inherited from a parent process (after a worker fork).
+    """
+    _clients.reset()
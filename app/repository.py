@@ -0,0 +1,296 @@
+from typing import Any, Dict, List, Optional, Tuple
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+from app.config import settings
+from app.utils.loop_local import LoopLocal
+
+def _or_filter(query, criteria: str):
+    """
+    Add a PostgREST or=(...) filter to a query.
+    The pinned postgrest client has no or_() builder and filter() always emits
+    "operator.criteria", so the parameter is added directly.
+    """
+    query.params = query.params.add("or", f"({criteria})")
+    return query
+
+def _order_by(query, *columns: str):
+    """
+    Order a query by several columns, e.g. _order_by(query, "created_at.desc", "id.desc").
+    Chained order() calls send repeated order parameters, of which PostgREST
+    only applies one, so the columns are sent as a single list.
+    """
+    query.params = query.params.add("order", ",".join(columns))
+    return query
+
+class Repository:
+    """
+    Async data access layer over Supabase's PostgREST API.
+    Every query is awaited on the event loop instead of blocking it, so one
+    uvicorn worker (or Celery task) can serve many requests concurrently.
+    """
+    
+    def __init__(self, url: str, key: str):
+        self.url = url
+        self.key = key
+        self._clients = LoopLocal(self._create_client, self._close_client)
+    
+    def _create_client(self) -> AsyncPostgrestClient:
+        headers = {
+            **DEFAULT_POSTGREST_CLIENT_HEADERS,
+            "apikey": self.key,
+            "Authorization": f"Bearer {self.key}"
+        }
+        return AsyncPostgrestClient(f"{self.url}/rest/v1", headers=headers, timeout=settings.HTTP_TIMEOUT)
+    
+    async def _close_client(self, client: AsyncPostgrestClient):
+        await client.aclose()
+    
+    def table(self, name: str):
+        """
+        Query builder for a table, bound to the running event loop's client.
+        """
+        return self._clients.get().from_(name)
+    
+    def rpc(self, function: str, params: Dict[str, Any]):
+        return self._clients.get().rpc(function, params)
+    
+    async def close(self):
+        """
+        Close the running event loop's connection pool (call on shutdown).
+        """
+        await self._clients.close()
+    
+    def reset(self):
+        """
+        Forget pools inherited from a parent process (after a worker fork).
+        """
+        self._clients.reset()
+    
+    # Users
+    
+    async def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        response = await self.table("users").select("*").eq("id", user_id).execute()
+        return response.data[0] if response.data else None
+    
+    async def create_user(self, user_record: Dict[str, Any]):
+        await self.table("users").insert(user_record).execute()
+    
+    # Workflows
+    
+    async def list_workflows(self) -> List[Dict[str, Any]]:
+        response = await self.table("workflows").select("*").order("id").execute()
+        return response.data
+    
+    async def get_workflow(self, workflow_id: int) -> Optional[Dict[str, Any]]:
+        response = await self.table("workflows").select("*").eq("id", workflow_id).execute()
+        return response.data[0] if response.data else None
+    
+    async def get_workflow_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        response = await self.table("workflows").select("*").eq("name", name).execute()
+        return response.data[0] if response.data else None
+    
+    async def count_workflows(self) -> int:
+        response = await self.table("workflows").select("count", count="exact").execute()
+        return response.count
+    
+    # User workflows
+    
+    async def get_user_workflow(self, user_id: str, workflow_id: int) -> Optional[Dict[str, Any]]:
+        response = await self.table("user_workflows").select("*").eq("user_id", user_id).eq("workflow_id", workflow_id).execute()
+        return response.data[0] if response.data else None
+    
+    async def create_user_workflow(self, user_workflow: Dict[str, Any]):
+        await self.table("user_workflows").insert(user_workflow).execute()
+    
+    async def set_user_workflow_active(self, user_id: str, workflow_id: int, is_active: bool) -> List[Dict[str, Any]]:
+        """
+        Returns the updated rows (empty if the user never had this workflow).
+        """
+        response = await self.table("user_workflows").update({"is_active": is_active}).eq("user_id", user_id).eq("workflow_id", workflow_id).execute()
+        return response.data
+    
+    async def get_active_user_workflows(self, user_id: str) -> List[Dict[str, Any]]:
+        """
+        Active user workflows with the workflow row embedded under "workflows".
+        """
+        response = await self.table("user_workflows").select("*, workflows(*)").eq("user_id", user_id).eq("is_active", True).execute()
+        return response.data
+    
+    async def get_inactive_workflow_user_ids(self, workflow_id: int) -> List[str]:
+        response = await self.table("user_workflows").select("user_id").eq("workflow_id", workflow_id).eq("is_active", False).execute()
+        return [str(row["user_id"]) for row in response.data]
+    
+    # Integrations
+    
+    async def get_integrations(self, user_id: str) -> List[Dict[str, Any]]:
+        response = await self.table("user_integrations").select("*").eq("user_id", user_id).execute()
+        return response.data
+    
+    async def get_integration(self, user_id: str, provider: str, columns: str = "*") -> Optional[Dict[str, Any]]:
+        response = await self.table("user_integrations").select(columns).eq("user_id", user_id).eq("provider", provider).execute()
+        return response.data[0] if response.data else None
+    
+    async def list_integrations(self, columns: str = "*") -> List[Dict[str, Any]]:
+        response = await self.table("user_integrations").select(columns).execute()
+        return response.data
+    
+    async def upsert_integration(self, integration: Dict[str, Any]):
+        """
+        Insert or replace a user's integration for a provider (unique on user_id, provider).
+        """
+        await self.table("user_integrations").upsert(integration, on_conflict="user_id,provider").execute()
+    
+    async def update_integration(self, user_id: str, provider: str, values: Dict[str, Any]):
+        await self.table("user_integrations").update(values).eq("user_id", user_id).eq("provider", provider).execute()
+    
+    async def get_expiring_integrations(self, provider: str, expires_before: str) -> List[Dict[str, Any]]:
+        """
+        Integrations with a usable refresh token whose access token expires before the given time.
+        Integrations waiting for the user to reconnect are left out.
+        """
+        response = await self.table("user_integrations").select("user_id, refresh_token, expires_at").eq("provider", provider).lt("expires_at", expires_before).not_.is_("refresh_token", "null").eq("needs_reconnect", False).execute()
+        return response.data
+    
+    async def get_notion_integration_user_ids(self, database_ids: List[str] = None, workspace_id: str = None) -> List[str]:
+        """
+        Users whose Notion integration targets one of the databases (or, failing that, the workspace).
+        """
+        query = self.table("user_integrations").select("user_id").eq("provider", "notion")
+        if database_ids:
+            query = query.in_("metadata->>database_id", database_ids)
+        elif workspace_id:
+            query = query.eq("metadata->>workspace_id", workspace_id)
+        else:
+            return []
+        response = await query.execute()
+        return [str(row["user_id"]) for row in response.data]
+    
+    # Calendar watch channels
+    
+    async def create_watch_channel(self, channel: Dict[str, Any]):
+        await self.table("calendar_watch_channels").insert(channel).execute()
+    
+    async def get_watch_channel(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        response = await self.table("calendar_watch_channels").select("*").eq("id", channel_id).execute()
+        return response.data[0] if response.data else None
+    
+    async def list_watch_channels(self) -> List[Dict[str, Any]]:
+        response = await self.table("calendar_watch_channels").select("*").execute()
+        return response.data
+    
+    async def delete_watch_channel(self, channel_id: str):
+        await self.table("calendar_watch_channels").delete().eq("id", channel_id).execute()
+    
+    # Notion sync state
+    
+    async def get_sync_watermark(self, user_id: str, database_id: str) -> Optional[str]:
+        response = await self.table("notion_sync_state").select("last_edited_watermark").eq("user_id", user_id).eq("database_id", database_id).execute()
+        return response.data[0]["last_edited_watermark"] if response.data else None
+    
+    async def advance_sync_watermark(self, user_id: str, database_id: str, watermark: str):
+        """
+        Atomically move the watermark forward (never backwards).
+        """
+        await self.rpc("advance_notion_watermark", {
+            "p_user_id": user_id,
+            "p_database_id": database_id,
+            "p_watermark": watermark
+        }).execute()
+    
+    # Notion page -> Google event mappings
+    
+    async def get_event_mappings(self, user_id: str, page_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Mappings of the given Notion pages, keyed by page ID.
+        """
+        if not page_ids:
+            return {}
+        response = await self.table("notion_event_mappings").select("*").eq("user_id", user_id).in_("notion_page_id", page_ids).execute()
+        return {row["notion_page_id"]: row for row in response.data}
+    
+    async def upsert_event_mappings(self, mappings: List[Dict[str, Any]]):
+        if mappings:
+            await self.table("notion_event_mappings").upsert(mappings, on_conflict="user_id,notion_page_id").execute()
+    
+    # Execution logs
+    
+    async def insert_log(self, record: Dict[str, Any]):
+        await self.insert_logs([record])
+    
+    async def insert_logs(self, records: List[Dict[str, Any]], ignore_duplicates: bool = False):
+        """
+        Insert many log records in one multi-row insert.
+        With ignore_duplicates, records whose id already exists are skipped.
+        """
+        if not records:
+            return
+        if ignore_duplicates:
+            await self.table("workflow_execution_logs").upsert(records, on_conflict="id,created_at", ignore_duplicates=True).execute()
+        else:
+            await self.table("workflow_execution_logs").insert(records).execute()
+    
+    async def get_logs(self, user_id: str, limit: Optional[int] = None, before: Optional[Tuple[str, str]] = None,
+                       workflow_id: Optional[int] = None, success: Optional[bool] = None,
+                       app: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        A user's logs, newest first, ordered by (created_at, id).
+        
+        Args:
+            before: Keyset cursor (created_at, id) of the last row already seen;
+                    only older rows are returned
+            workflow_id, success, app: Optional filters
+        """
+        query = self.table("workflow_execution_logs").select("*").eq("user_id", user_id)
+        if workflow_id is not None:
+            query = query.eq("workflow_id", workflow_id)
+        if success is not None:
+            query = query.eq("success", success)
+        if app:
+            query = query.eq("app", app)
+        if before:
+            created_at, log_id = before
+            query = _or_filter(query, f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{log_id})')
+        
+        query = _order_by(query, "created_at.desc", "id.desc")
+        if limit:
+            query = query.limit(limit)
+        response = await query.execute()
+        return response.data
+    
+    async def get_workflow_totals(self, user_id: str) -> List[Dict[str, Any]]:
+        """
+        Pre-aggregated per-workflow counters for a user (from the rollups view).
+        """
+        response = await self.table("workflow_execution_totals").select("*").eq("user_id", user_id).execute()
+        return response.data
+    
+    # Log partition maintenance (service role only)
+    
+    async def ensure_log_partitions(self, months_ahead: int) -> int:
+        """
+        Create the monthly log partitions up to months_ahead; returns how many were created.
+        """
+        response = await self.rpc("ensure_workflow_log_partitions", {"months_ahead": months_ahead, "months_back": 0}).execute()
+        return response.data or 0
+    
+    async def list_expired_log_partitions(self, retention_months: int) -> List[Dict[str, Any]]:
+        response = await self.rpc("list_expired_workflow_log_partitions", {"retention_months": retention_months}).execute()
+        return response.data
+    
+    async def drop_log_partition(self, partition_name: str):
+        await self.rpc("drop_workflow_log_partition", {"p_partition_name": partition_name}).execute()
+    
+    async def get_logs_between(self, start: str, end: str, limit: int,
+                               after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        All users' logs with start <= created_at < end, oldest first, keyset-paginated on (created_at, id).
+        """
+        query = self.table("workflow_execution_logs").select("*").gte("created_at", start).lt("created_at", end)
+        if after:
+            created_at, log_id = after
+            query = _or_filter(query, f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{log_id})')
+        response = await _order_by(query, "created_at", "id").limit(limit).execute()
+        return response.data
+
+repository = Repository(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+admin_repository = Repository(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
-import httpx
+import asyncio
 import secrets
 from datetime import datetime, timezone, timedelta
 
@@ -10,6 +10,8 @@ from urllib.parse import urlencode
 
 from app.config import settings
 from app.database import supabase
+from app.repository import repository
+from app.services.http_client import get_http_client
 from app.models.user import User, UserCreate, UserIntegration
 
 router = APIRouter()
@@ -28,7 +30,7 @@ class LoginRequest(BaseModel):
 async def signup(user_data: UserCreate):
     try:
         # Check if email confirmation is required
-        response = supabase.auth.sign_up({
+        response = await asyncio.to_thread(supabase.auth.sign_up, {
             "email": user_data.email,
             "password": user_data.password
         })
@@ -42,7 +44,7 @@ async def signup(user_data: UserCreate):
             }
             
             # Insert user into our custom users table
-            supabase.table("users").insert(user_record).execute()
+            await repository.create_user(user_record)
             
             # Check if user needs email confirmation
             if response.session:
@@ -68,13 +70,12 @@ async def signup(user_data: UserCreate):
 @router.post("/login", response_model=AuthResponse)
 async def login(login_data: LoginRequest):
     try:
-        response = supabase.auth.sign_in_with_password({
+        response = await asyncio.to_thread(supabase.auth.sign_in_with_password, {
             "email": login_data.email,
             "password": login_data.password
         })
         if response.user:
-            user_response = supabase.table("users").select("*").eq("id", response.user.id).execute()
-            user_data = user_response.data[0] if user_response.data else {}
+            user_data = await repository.get_user(response.user.id) or {}
             return AuthResponse(
                 access_token=response.session.access_token,
                 user=User(**user_data)
@@ -111,7 +112,7 @@ async def google_callback(request: Request):
 
     try:
         # Exchange code for tokens
-        token_response = httpx.post("https://oauth2.googleapis.com/token", data={
+        token_response = await get_http_client().post("https://oauth2.googleapis.com/token", data={
             "code": code,
             "client_id": settings.GOOGLE_CLIENT_ID,
             "client_secret": settings.GOOGLE_CLIENT_SECRET,
@@ -129,18 +130,12 @@ async def google_callback(request: Request):
             "provider": "google",
             "access_token": token_data["access_token"],
             "refresh_token": token_data.get("refresh_token"),
-            "expires_at": (datetime.now(timezone.utc) + timedelta(seconds=token_data.get("expires_in", 3600))).isoformat()
+            "expires_at": (datetime.now(timezone.utc) + timedelta(seconds=token_data.get("expires_in", 3600))).isoformat(),
+            "needs_reconnect": False
         }
         
-        # Check if integration already exists
-        existing = supabase.table("user_integrations").select("*").eq("user_id", user_id).eq("provider", "google").execute()
-        
-        if existing.data:
-            # Update existing integration
-            supabase.table("user_integrations").update(integration_data).eq("user_id", user_id).eq("provider", "google").execute()
-        else:
-            # Insert new integration
-            supabase.table("user_integrations").insert(integration_data).execute()
+        # Insert or update the existing integration in one round trip
+        await repository.upsert_integration(integration_data)
         
         return {"status": "success", "message": "Google Calendar integration connected successfully"}
         
@@ -193,7 +188,7 @@ async def notion_callback(request: Request):
             raise HTTPException(status_code=400, detail="Invalid state parameter")
         
         # Exchange code for tokens
-        token_response = httpx.post(
+        token_response = await get_http_client().post(
             "https://api.notion.com/v1/oauth/token",
             auth=(settings.NOTION_CLIENT_ID, settings.NOTION_CLIENT_SECRET),
             data={
@@ -211,6 +206,9 @@ async def notion_callback(request: Request):
         metadata = {}
         if database_id:
             metadata["database_id"] = database_id
+        if token_data.get("workspace_id"):
+            # Lets webhook events be routed to this user
+            metadata["workspace_id"] = token_data["workspace_id"]
         
         # Save integration to database with metadata
         integration_data = {
@@ -222,15 +220,8 @@ async def notion_callback(request: Request):
             "metadata": metadata
         }
         
-        # Check if integration already exists
-        existing = supabase.table("user_integrations").select("*").eq("user_id", user_id).eq("provider", "notion").execute()
-        
-        if existing.data:
-            # Update existing integration
-            supabase.table("user_integrations").update(integration_data).eq("user_id", user_id).eq("provider", "notion").execute()
-        else:
-            # Insert new integration
-            supabase.table("user_integrations").insert(integration_data).execute()
+        # Insert or update the existing integration in one round trip
+        await repository.upsert_integration(integration_data)
         
         message = "Notion integration connected successfully"
         if database_id:
@@ -249,12 +240,12 @@ async def notion_callback(request: Request):
 async def get_user_integrations(user_id: str):
     """Get all integrations for a user"""
     try:
-        response = supabase.table("user_integrations").select("*").eq("user_id", user_id).execute()
+        user_integrations = await repository.get_integrations(user_id)
         
-        if response.data:
+        if user_integrations:
             # Remove sensitive data before returning
             integrations = []
-            for integration in response.data:
+            for integration in user_integrations:
                 safe_integration = {
                     "id": integration["id"],
                     "provider": integration["provider"],
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException
-from app.database import supabase
+from app.repository import repository
 from app.celery import celery_app
 import redis
 from app.config import settings
+from app.services.rate_limiter import read_rate_limit_metrics
 
 router = APIRouter()
 
@@ -45,12 +46,12 @@ async def database_health_check():
     """Check database connection"""
     try:
         # Test database connection
-        response = supabase.table("workflows").select("count", count="exact").execute()
+        workflows_count = await repository.count_workflows()
         
         return {
             "status": "healthy",
             "database": "connected",
-            "workflows_count": response.count
+            "workflows_count": workflows_count
         }
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Database health check failed: {str(e)}")
@@ -69,4 +70,17 @@ async def redis_health_check():
             "broker": settings.REDIS_CELERY_BROKER
         }
     except Exception as e:
-        raise HTTPException(status_code=503, detail=f"Redis health check failed: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=503, detail=f"Redis health check failed: {str(e)}")
+
+@router.get("/health/rate-limits")
+async def rate_limit_metrics():
+    """Current outbound rate limiter waits published by the workers"""
+    try:
+        limiters = await read_rate_limit_metrics()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Rate limit metrics unavailable: {str(e)}")
+    return {
+        "status": "healthy",
+        "limiters": limiters,
+        "max_wait_seconds": max((limiter["wait_seconds"] for limiter in limiters), default=0.0)
+    }
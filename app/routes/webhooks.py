@@ -0,0 +1,118 @@
+from fastapi import APIRouter, HTTPException, Header, Request
+from typing import List, Optional
+from app.config import settings
+from app.repository import repository
+from app.tasks.triggers import claim_webhook_event, release_webhook_event, trigger_user_workflows
+import hashlib
+import hmac
+import json
+import uuid
+
+router = APIRouter()
+
+# Notion events that can change what a workflow would read
+NOTION_EVENT_PREFIXES = ("page.", "database.", "data_source.")
+
+def verify_notion_signature(body: bytes, signature: Optional[str]) -> bool:
+    """Check X-Notion-Signature: sha256=HMAC-SHA256(verification_token, raw body)"""
+    if not settings.NOTION_WEBHOOK_VERIFICATION_TOKEN or not signature:
+        return False
+    expected = "sha256=" + hmac.new(settings.NOTION_WEBHOOK_VERIFICATION_TOKEN.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def notion_id_variants(notion_id: str) -> List[str]:
+    """Notion IDs are stored both with and without hyphens"""
+    try:
+        hyphenated = str(uuid.UUID(notion_id))
+    except ValueError:
+        return [notion_id]
+    return [hyphenated, hyphenated.replace("-", "")]
+
+def notion_event_database_ids(payload: dict) -> List[str]:
+    """The database an event belongs to: the changed page's parent, or the database itself"""
+    parent = (payload.get("data") or {}).get("parent") or {}
+    entity = payload.get("entity") or {}
+    if parent.get("type") in ("database", "data_source") and parent.get("id"):
+        return notion_id_variants(parent["id"])
+    if entity.get("type") in ("database", "data_source") and entity.get("id"):
+        return notion_id_variants(entity["id"])
+    return []
+
+@router.post("/notion")
+async def notion_webhook(request: Request, x_notion_signature: Optional[str] = Header(None)):
+    """
+    Notion change notifications. Runs the affected users' Notion-triggered workflows.
+    """
+    body = await request.body()
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    
+    # One-time subscription handshake. The request is unauthenticated, so its token is never
+    # echoed: operators copy the real one from the Notion integration's webhook settings.
+    if "verification_token" in payload and "type" not in payload:
+        print(f"🔐 Notion webhook verification request received (subscription: {payload.get('subscription_id', 'unknown')}); "
+              "copy the verification token from the Notion integration settings into NOTION_WEBHOOK_VERIFICATION_TOKEN")
+        return {"status": "verification_received"}
+    
+    if not verify_notion_signature(body, x_notion_signature):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    
+    event_type = payload.get("type", "")
+    if not event_type.startswith(NOTION_EVENT_PREFIXES) or event_type == "page.deleted":
+        return {"status": "ignored", "type": event_type}
+    
+    event_id = payload.get("id")
+    if not await claim_webhook_event("notion", event_id):
+        return {"status": "duplicate"}
+    
+    try:
+        user_ids = await repository.get_notion_integration_user_ids(
+            notion_event_database_ids(payload), payload.get("workspace_id")
+        )
+        result = await trigger_user_workflows("notion", user_ids)
+    except Exception as e:
+        # Let Notion's retry through instead of dropping it as a duplicate
+        await release_webhook_event("notion", event_id)
+        raise HTTPException(status_code=500, detail=f"Failed to process Notion webhook: {str(e)}")
+    
+    return {"status": "accepted", **result}
+
+@router.post("/google/calendar")
+async def google_calendar_webhook(x_goog_channel_id: Optional[str] = Header(None),
+                                  x_goog_channel_token: Optional[str] = Header(None),
+                                  x_goog_resource_state: Optional[str] = Header(None),
+                                  x_goog_message_number: Optional[str] = Header(None)):
+    """
+    Google Calendar push notifications (events.watch). Runs the channel owner's Google-triggered workflows.
+    """
+    if not x_goog_channel_id:
+        raise HTTPException(status_code=400, detail="Missing X-Goog-Channel-ID")
+    
+    try:
+        channel = await repository.get_watch_channel(x_goog_channel_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to process Google webhook: {str(e)}")
+    
+    # 404 tells Google not to retry notifications for channels we no longer know
+    if not channel:
+        raise HTTPException(status_code=404, detail="Unknown channel")
+    if not hmac.compare_digest(channel["token"], x_goog_channel_token or ""):
+        raise HTTPException(status_code=401, detail="Invalid channel token")
+    
+    # Sent once when the channel opens; nothing changed yet
+    if x_goog_resource_state == "sync":
+        return {"status": "sync"}
+    
+    event_id = f"{x_goog_channel_id}:{x_goog_message_number}"
+    if not await claim_webhook_event("google", event_id):
+        return {"status": "duplicate"}
+    
+    try:
+        result = await trigger_user_workflows("google", [str(channel["user_id"])])
+    except Exception as e:
+        await release_webhook_event("google", event_id)
+        raise HTTPException(status_code=500, detail=f"Failed to process Google webhook: {str(e)}")
+    
+    return {"status": "accepted", **result}
@@ -1,20 +1,29 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, Tuple
 from app.models.user import User
-from app.database import supabase
-from app.auth import get_current_user
+from app.repository import repository
+from app.auth import get_current_user, get_stream_user
+from app.utils.progress import subscribe_progress
+from app.utils.jobs import record_job_owner, get_job_owner, get_job_status
+from app.main_tasks import execute_user_workflow
 from app.tasks.task_factory import TaskFactory
+import asyncio
+import base64
+import json
 import uuid
 from datetime import datetime
 
 router = APIRouter()
 
+MAX_LOGS_PAGE_SIZE = 500
+EXPORT_PAGE_SIZE = 1000
+
 @router.get("/list", response_model=List[Dict[str, Any]])
 async def get_all_workflows():
     """Get all workflows from database"""
     try:
-        workflows_response = supabase.table("workflows").select("*").order("id").execute()
-        return workflows_response.data
+        return await repository.list_workflows()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get workflows: {str(e)}")
 
@@ -23,16 +32,15 @@ async def activate_workflow(workflow_id: int, current_user: User = Depends(get_c
     """Activate a workflow for the current user"""
     try:
         # Check if workflow exists
-        workflow_response = supabase.table("workflows").select("*").eq("id", workflow_id).execute()
-        if not workflow_response.data:
+        if not await repository.get_workflow(workflow_id):
             raise HTTPException(status_code=404, detail="Workflow not found")
         
         # Check if user already has this workflow activated
-        existing_response = supabase.table("user_workflows").select("*").eq("user_id", str(current_user.id)).eq("workflow_id", workflow_id).execute()
+        existing = await repository.get_user_workflow(str(current_user.id), workflow_id)
         
-        if existing_response.data:
+        if existing:
             # Update existing record to active
-            supabase.table("user_workflows").update({"is_active": True}).eq("user_id", str(current_user.id)).eq("workflow_id", workflow_id).execute()
+            await repository.set_user_workflow_active(str(current_user.id), workflow_id, True)
             return {"status": "success", "message": "Workflow activated successfully"}
         else:
             # Create new user workflow record
@@ -41,7 +49,7 @@ async def activate_workflow(workflow_id: int, current_user: User = Depends(get_c
                 "workflow_id": workflow_id,
                 "is_active": True
             }
-            supabase.table("user_workflows").insert(user_workflow_data).execute()
+            await repository.create_user_workflow(user_workflow_data)
             return {"status": "success", "message": "Workflow activated successfully"}
             
     except HTTPException:
@@ -54,9 +62,9 @@ async def deactivate_workflow(workflow_id: int, current_user: User = Depends(get
     """Deactivate a workflow for the current user"""
     try:
         # Update user workflow to inactive
-        result = supabase.table("user_workflows").update({"is_active": False}).eq("user_id", str(current_user.id)).eq("workflow_id", workflow_id).execute()
+        updated = await repository.set_user_workflow_active(str(current_user.id), workflow_id, False)
         
-        if result.data:
+        if updated:
             return {"status": "success", "message": "Workflow deactivated successfully"}
         else:
             raise HTTPException(status_code=404, detail="User workflow not found")
@@ -71,11 +79,11 @@ async def get_user_active_workflows(current_user: User = Depends(get_current_use
     """Get all active workflows for the current user"""
     try:
         # Get user's active workflows with workflow details
-        response = supabase.table("user_workflows").select("*, workflows(*)").eq("user_id", str(current_user.id)).eq("is_active", True).execute()
+        user_workflows = await repository.get_active_user_workflows(str(current_user.id))
         
         # Format the response
         active_workflows = []
-        for item in response.data:
+        for item in user_workflows:
             if item.get("workflows"):
                 active_workflows.append({
                     "user_workflow_id": item["id"],
@@ -90,30 +98,31 @@ async def get_user_active_workflows(current_user: User = Depends(get_current_use
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get user workflows: {str(e)}")
 
-@router.post("/execute")
+@router.post("/execute", status_code=202)
 async def execute_workflow(workflow_id: int, current_user: User = Depends(get_current_user)):
-    """Execute a workflow manually for the current user"""
+    """
+    Queue a manual workflow run for the current user and return its job ID right away.
+    Poll GET /workflows/jobs/{job_id} for progress and the result.
+    """
     try:
         # Check if workflow exists
-        workflow_response = supabase.table("workflows").select("*").eq("id", workflow_id).execute()
-        if not workflow_response.data:
+        workflow = await repository.get_workflow(workflow_id)
+        if not workflow:
             raise HTTPException(status_code=404, detail="Workflow not found")
         
-        workflow = workflow_response.data[0]
-        
-        # Create task using factory
-        task = TaskFactory.create_task("notion_to_google", workflow_id, workflow["name"])
-        if not task:
+        # Resolve the task type by workflow, failing fast instead of inside the worker
+        if not TaskFactory.task_type_for_workflow(workflow["name"]):
             raise HTTPException(status_code=400, detail="Failed to create workflow task")
         
-        # Execute the task
-        result = await task.run_with_logging(str(current_user.id))
+        # Publishing to the broker is blocking; keep it off the event loop
+        job = await asyncio.to_thread(execute_user_workflow.delay, workflow_id, str(current_user.id))
+        await record_job_owner(job.id, str(current_user.id))
         
         return {
-            "status": "success",
+            "status": "queued",
+            "job_id": job.id,
             "workflow_id": workflow_id,
-            "workflow_name": workflow["name"],
-            "result": result
+            "workflow_name": workflow["name"]
         }
         
     except HTTPException:
@@ -121,54 +130,104 @@ async def execute_workflow(workflow_id: int, current_user: User = Depends(get_cu
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to execute workflow: {str(e)}")
 
+@router.get("/jobs/{job_id}")
+async def get_workflow_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Get the status, progress and result of a manual workflow run"""
+    try:
+        owner = await get_job_owner(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get job status: {str(e)}")
+    
+    # Unknown, expired and other users' jobs all look the same
+    if owner != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    try:
+        return await get_job_status(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get job status: {str(e)}")
+
+def encode_cursor(log: Dict[str, Any]) -> str:
+    """Opaque keyset cursor for the (created_at, id) of a log row"""
+    return base64.urlsafe_b64encode(json.dumps([log["created_at"], log["id"]]).encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, log_id = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        # Validate before the values are embedded in a PostgREST filter
+        datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        return created_at, str(uuid.UUID(log_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/logs", response_model=List[Dict[str, Any]])
-async def get_workflow_logs(current_user: User = Depends(get_current_user), limit: int = 50):
-    """Get workflow execution logs for the current user"""
+async def get_workflow_logs(response: Response, current_user: User = Depends(get_current_user),
+                            limit: int = Query(50, ge=1, le=MAX_LOGS_PAGE_SIZE), cursor: Optional[str] = None,
+                            workflow_id: Optional[int] = None, success: Optional[bool] = None, app: Optional[str] = None):
+    """
+    Get workflow execution logs for the current user, newest first.
+    Pass the X-Next-Cursor response header back as cursor to get the next (older) page.
+    """
+    before = decode_cursor(cursor) if cursor else None
     try:
-        logs_response = supabase.table("workflow_execution_logs").select("*").eq("user_id", str(current_user.id)).order("created_at", desc=True).limit(limit).execute()
-        return logs_response.data
+        logs = await repository.get_logs(str(current_user.id), limit, before=before,
+                                         workflow_id=workflow_id, success=success, app=app)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get workflow logs: {str(e)}")
+    
+    if len(logs) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(logs[-1])
+    return logs
+
+@router.get("/logs/export")
+async def export_workflow_logs(current_user: User = Depends(get_current_user), workflow_id: Optional[int] = None,
+                               success: Optional[bool] = None, app: Optional[str] = None):
+    """Stream all matching workflow execution logs as NDJSON (one log per line), newest first"""
+    user_id = str(current_user.id)
+    
+    async def stream_logs():
+        before = None
+        while True:
+            logs = await repository.get_logs(user_id, EXPORT_PAGE_SIZE, before=before,
+                                             workflow_id=workflow_id, success=success, app=app)
+            for log in logs:
+                yield json.dumps(log, default=str) + "\n"
+            if len(logs) < EXPORT_PAGE_SIZE:
+                return
+            before = (logs[-1]["created_at"], logs[-1]["id"])
+    
+    return StreamingResponse(
+        stream_logs(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=workflow_logs.ndjson"}
+    )
 
 @router.get("/analytics", response_model=Dict[str, Any])
 async def get_workflow_analytics(current_user: User = Depends(get_current_user)):
     """Get workflow analytics for the current user"""
     try:
-        # Get user's logs
-        logs_response = supabase.table("workflow_execution_logs").select("*").eq("user_id", str(current_user.id)).execute()
-        logs = logs_response.data
+        # Read pre-aggregated rollups (one row per workflow, independent of log history size)
+        # and the 10 newest logs (via the user_id/created_at index) concurrently
+        totals, recent_activity = await asyncio.gather(
+            repository.get_workflow_totals(str(current_user.id)),
+            repository.get_logs(str(current_user.id), 10)
+        )
         
         # Calculate overall analytics
-        total_actions = len(logs)
-        successful_actions = len([log for log in logs if log.get("success", False)])
+        total_actions = sum(row.get("actions") or 0 for row in totals)
+        successful_actions = sum(row.get("successful_actions") or 0 for row in totals)
         success_rate = (successful_actions / total_actions * 100) if total_actions > 0 else 0
         
         # Get workflow-specific analytics
         workflow_analytics = {}
-        for log in logs:
-            if log.get("step_type") == "execution" and log.get("app") == "workflow":
-                workflow_id = log.get("workflow_id")
-                if workflow_id not in workflow_analytics:
-                    workflow_analytics[workflow_id] = {
-                        "executions": 0,
-                        "successful": 0,
-                        "failed": 0,
-                        "last_execution": None
-                    }
-                
-                workflow_analytics[workflow_id]["executions"] += 1
-                if log.get("success"):
-                    workflow_analytics[workflow_id]["successful"] += 1
-                else:
-                    workflow_analytics[workflow_id]["failed"] += 1
-                
-                # Track last execution
-                if not workflow_analytics[workflow_id]["last_execution"] or log.get("created_at") > workflow_analytics[workflow_id]["last_execution"]:
-                    workflow_analytics[workflow_id]["last_execution"] = log.get("created_at")
-        
-        # Get recent activity (last 10 logs)
-        recent_activity = logs[:10]
+        for row in totals:
+            if row.get("executions"):
+                workflow_analytics[row["workflow_id"]] = {
+                    "executions": row["executions"],
+                    "successful": row.get("successes") or 0,
+                    "failed": row.get("failures") or 0,
+                    "last_execution": row.get("last_execution")
+                }
         
         return {
             "overall": {
@@ -182,3 +241,29 @@ async def get_workflow_analytics(current_user: User = Depends(get_current_user))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get workflow analytics: {str(e)}")
 
+@router.get("/stream")
+async def stream_workflow_progress(request: Request, current_user: User = Depends(get_stream_user)):
+    """
+    Server-sent events stream of the current user's live workflow progress
+    (started, entry_scheduled, entry_failed, completed, failed).
+    Authenticate with the Authorization header or, for EventSource, a token query parameter.
+    """
+    user_id = str(current_user.id)
+    
+    async def stream_events():
+        # Tell the browser how long to wait before reconnecting
+        yield "retry: 5000\n\n"
+        async for event in subscribe_progress(user_id):
+            if await request.is_disconnected():
+                return
+            if event is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+    
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -2,6 +2,10 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, List
 import httpx
 import asyncio
+from app.services.http_client import get_http_client
+from app.services.rate_limiter import get_rate_limiter, parse_retry_after, backoff_delay, publish_rate_limit_metrics
+
+RETRYABLE_STATUS_CODES = {408, 500, 502, 503, 504}
 
 class BaseService(ABC):
     """
@@ -9,6 +13,9 @@ class BaseService(ABC):
     Provides common functionality and interface for all services.
     """
     
+    # Rate limiter key (see app.services.rate_limiter)
+    provider = "default"
+    
     def __init__(self, access_token: str):
         self.access_token = access_token
         self.headers = {
@@ -29,47 +36,90 @@ class BaseService(ABC):
         """
         Common HTTP request method with retry logic.
         """
+        response = await self.send_request(method, url, json_data=data, max_retries=max_retries)
+        if response is not None and response.status_code == 200:
+            return response.json()
+        return None
+    
+    async def send_request(self, method: str, url: str, json_data: Optional[Dict] = None,
+                           content: Optional[bytes] = None, headers: Optional[Dict[str, str]] = None,
+                           max_retries: int = 3, cost: int = 1) -> Optional[httpx.Response]:
+        """
+        Send a request with rate limiting and retry logic and return the raw response.
+        cost is the number of rate-limit tokens the request uses (one per batched call).
+        Throttled (429) and transient (408/5xx) responses are retried with jittered
+        backoff; other client errors are returned without retrying.
+        Returns None when authentication fails or every attempt failed.
+        """
+        if method.upper() not in ("GET", "POST", "PATCH", "PUT", "DELETE"):
+            raise ValueError(f"Unsupported HTTP method: {method}")
+        
+        request_headers = {**self.headers, **(headers or {})}
+        
+        limiter = get_rate_limiter(self.provider, self.access_token)
+        
         for attempt in range(max_retries):
             try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    if method.upper() == "GET":
-                        response = await client.get(url, headers=self.headers)
-                    elif method.upper() == "POST":
-                        response = await client.post(url, headers=self.headers, json=data)
-                    elif method.upper() == "PATCH":
-                        response = await client.patch(url, headers=self.headers, json=data)
-                    elif method.upper() == "PUT":
-                        response = await client.put(url, headers=self.headers, json=data)
-                    else:
-                        raise ValueError(f"Unsupported HTTP method: {method}")
+                # Pre-throttle to stay under the provider's rate limit
+                await limiter.acquire(cost)
+                await publish_rate_limit_metrics()
+                
+                # Shared pooled client: connections stay alive across calls
+                client = get_http_client()
+                response = await client.request(
+                    method.upper(),
+                    url,
+                    headers=request_headers,
+                    json=json_data,
+                    content=content
+                )
+                
+                if response.is_success:
+                    return response
+                elif response.status_code == 401:
+                    print(f"Authentication failed for {self.__class__.__name__}")
+                    return None
+                elif self.is_throttled(response):
+                    # Honor Retry-After for every caller sharing this token
+                    delay = parse_retry_after(response.headers.get("Retry-After")) or backoff_delay(attempt)
+                    limiter.penalize(delay)
+                    print(f"Rate limited by {self.provider} (attempt {attempt + 1}), retrying in {delay:.1f}s")
+                    if attempt < max_retries - 1:
+                        continue
+                    return None
+                elif response.status_code in RETRYABLE_STATUS_CODES:
+                    print(f"Request failed (attempt {attempt + 1}): {response.status_code} - {response.text}")
+                    if attempt < max_retries - 1:
+                        await asyncio.sleep(backoff_delay(attempt))
+                        continue
+                    return None
+                else:
+                    # Other client errors will not succeed on retry
+                    print(f"Request failed: {response.status_code} - {response.text}")
+                    return response
                     
-                    if response.status_code == 200:
-                        return response.json()
-                    elif response.status_code == 401:
-                        print(f"Authentication failed for {self.__class__.__name__}")
-                        return None
-                    else:
-                        print(f"Request failed (attempt {attempt + 1}): {response.status_code} - {response.text}")
-                        if attempt < max_retries - 1:
-                            await asyncio.sleep(2 ** attempt)  # Exponential backoff
-                            continue
-                        return None
-                        
             except httpx.TimeoutException:
                 print(f"Timeout (attempt {attempt + 1}) for {self.__class__.__name__}")
                 if attempt < max_retries - 1:
-                    await asyncio.sleep(2 ** attempt)
+                    await asyncio.sleep(backoff_delay(attempt))
                     continue
                 return None
             except Exception as e:
                 print(f"Unexpected error (attempt {attempt + 1}) for {self.__class__.__name__}: {str(e)}")
                 if attempt < max_retries - 1:
-                    await asyncio.sleep(2 ** attempt)
+                    await asyncio.sleep(backoff_delay(attempt))
                     continue
                 return None
         
         return None
     
+    def is_throttled(self, response: httpx.Response) -> bool:
+        """
+        Whether the provider rejected the call for rate limiting.
+        Services whose APIs signal throttling differently can override this.
+        """
+        return response.status_code == 429
+    
     def validate_token(self) -> bool:
         """
         Basic token validation - can be overridden by specific services.
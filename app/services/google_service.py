@@ -1,37 +1,79 @@
 import httpx
+import hashlib
+import json
+import uuid
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 import asyncio
 from app.services.base_service import BaseService
 
+CALENDAR_EVENTS_PATH = "/calendar/v3/calendars/primary/events"
+BATCH_URL = "https://www.googleapis.com/batch/calendar/v3"
+BATCH_MAX_SIZE = 50  # Google's recommended maximum calls per batch request
+CHANNELS_STOP_URL = "https://www.googleapis.com/calendar/v3/channels/stop"
+
+def make_event_id(seed: str) -> str:
+    """
+    Deterministic Calendar event ID for a seed such as "user_id:notion_page_id".
+    Hex digits are valid base32hex, so retrying an insert with the same ID
+    fails with 409 instead of creating a duplicate event.
+    """
+    return hashlib.sha1(seed.encode("utf-8")).hexdigest()
+
 class GoogleService(BaseService):
     """
     Google service for Calendar operations.
     """
     
+    provider = "google"
+    
+    def is_throttled(self, response: httpx.Response) -> bool:
+        """
+        Google reports quota exhaustion as 403 rateLimitExceeded/userRateLimitExceeded as well as 429.
+        """
+        if response.status_code == 403:
+            try:
+                errors = response.json().get("error", {}).get("errors", [])
+            except ValueError:
+                return False
+            return any(error.get("reason") in ("rateLimitExceeded", "userRateLimitExceeded") for error in errors)
+        return super().is_throttled(response)
+    
     async def execute_action(self, action: str, data: Dict[str, Any]) -> Any:
         """
         Execute Google-specific actions.
         """
         if action == "create_event":
             return await self.create_event(
+                summary=data.get("summary"),
+                start_time=data.get("start_time"),
+                end_time=data.get("end_time"),
+                attendees=data.get("attendees", []),
+                event_id=data.get("event_id")
+            )
+        elif action == "update_event":
+            return await self.update_event(
+                event_id=data.get("event_id"),
                 summary=data.get("summary"),
                 start_time=data.get("start_time"),
                 end_time=data.get("end_time"),
                 attendees=data.get("attendees", [])
             )
+        elif action == "create_events_batch":
+            return await self.create_events_batch(data.get("events", []))
         else:
             raise ValueError(f"Unknown Google action: {action}")
     
-    async def create_event(
+    def build_event_body(
         self,
         summary: str,
         start_time: str,
         end_time: str,
-        attendees: List[str]
-    ) -> Optional[str]:
+        attendees: List[str],
+        event_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
         """
-        Create a Google Calendar event and return the event ID with retry logic
+        Build the Calendar API event resource, or None if the dates are invalid
         """
         
         # Convert ISO string to RFC3339 format for Google Calendar
@@ -42,7 +84,7 @@ class GoogleService(BaseService):
             print(f"Invalid date format: {e}")
             return None
         
-        event_data = {
+        body = {
             "summary": summary,
             "start": {
                 "dateTime": start_datetime.isoformat(),
@@ -61,17 +103,228 @@ class GoogleService(BaseService):
                 ]
             }
         }
+        if event_id:
+            body["id"] = event_id
+        return body
+    
+    async def create_event(
+        self,
+        summary: str,
+        start_time: str,
+        end_time: str,
+        attendees: List[str],
+        event_id: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Create a Google Calendar event and return the event ID with retry logic.
+        With a deterministic event_id, an event that already exists counts as created.
+        """
+        event_data = self.build_event_body(summary, start_time, end_time, attendees, event_id)
+        if not event_data:
+            return None
         
-        response_data = await self.make_request(
+        response = await self.send_request(
             "POST",
-            "https://www.googleapis.com/calendar/v3/calendars/primary/events",
+            f"https://www.googleapis.com{CALENDAR_EVENTS_PATH}",
             event_data
         )
         
-        if response_data:
-            event_id = response_data.get("id")
+        if response is not None and response.status_code == 200:
+            event_id = response.json().get("id")
             print(f"Created Google Calendar event: {event_id}")
             return event_id
+        elif response is not None and response.status_code == 409 and event_id:
+            print(f"Google Calendar event already exists: {event_id}")
+            return event_id
         else:
             print("Failed to create Google Calendar event")
-            return None 
\ No newline at end of file
+            return None
+    
+    async def update_event(
+        self,
+        event_id: str,
+        summary: str,
+        start_time: str,
+        end_time: str,
+        attendees: List[str]
+    ) -> Optional[bool]:
+        """
+        Patch an existing event's title, dates, attendees and reminders.
+        Returns True when updated, False on failure, and None when the event
+        no longer exists (deleted in Google Calendar).
+        """
+        event_data = self.build_event_body(summary, start_time, end_time, attendees)
+        if not event_data:
+            return False
+        
+        response = await self.send_request(
+            "PATCH",
+            f"https://www.googleapis.com{CALENDAR_EVENTS_PATH}/{event_id}",
+            event_data
+        )
+        
+        if response is not None and response.status_code == 200:
+            print(f"Updated Google Calendar event: {event_id}")
+            return True
+        elif response is not None and response.status_code in (404, 410):
+            print(f"Google Calendar event {event_id} no longer exists")
+            return None
+        else:
+            print(f"Failed to update Google Calendar event {event_id}")
+            return False
+    
+    async def create_events_batch(self, events: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        """
+        Create many events through the Calendar batch endpoint, up to 50 inserts per request.
+        
+        Args:
+            events: Dicts with "key" (e.g. the originating Notion page ID) plus
+                    summary, start_time, end_time, attendees and optionally a
+                    deterministic event_id (an existing event then counts as created)
+        
+        Returns: key -> created event ID (None if that insert failed)
+        """
+        results: Dict[str, Optional[str]] = {}
+        bodies = {}
+        for event in events:
+            body = self.build_event_body(
+                event.get("summary"),
+                event.get("start_time"),
+                event.get("end_time"),
+                event.get("attendees", []),
+                event.get("event_id")
+            )
+            if body:
+                bodies[event["key"]] = body
+            else:
+                results[event["key"]] = None
+        
+        keys = list(bodies.keys())
+        for i in range(0, len(keys), BATCH_MAX_SIZE):
+            chunk = {key: bodies[key] for key in keys[i:i + BATCH_MAX_SIZE]}
+            results.update(await self._send_insert_batch(chunk))
+        
+        return results
+    
+    async def _send_insert_batch(self, bodies: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        """
+        Send one multipart/mixed batch of event inserts and map each part back to its key.
+        """
+        boundary = f"batch_{uuid.uuid4().hex}"
+        keys = list(bodies.keys())
+        
+        parts = []
+        for index, key in enumerate(keys):
+            parts.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <item-{index}>\r\n"
+                f"\r\n"
+                f"POST {CALENDAR_EVENTS_PATH} HTTP/1.1\r\n"
+                f"Content-Type: application/json\r\n"
+                f"\r\n"
+                f"{json.dumps(bodies[key])}\r\n"
+            )
+        payload = "".join(parts) + f"--{boundary}--\r\n"
+        
+        response = await self.send_request(
+            "POST",
+            BATCH_URL,
+            content=payload.encode("utf-8"),
+            headers={"Content-Type": f"multipart/mixed; boundary={boundary}"},
+            cost=len(keys)
+        )
+        
+        results: Dict[str, Optional[str]] = {key: None for key in keys}
+        if response is None or not response.is_success:
+            print(f"Failed to send Google Calendar batch of {len(keys)} events")
+            return results
+        
+        for content_id, status_code, body in parse_batch_response(response):
+            # Response parts are labelled <response-item-N> after the request part they answer
+            try:
+                index = int(content_id.rsplit("-", 1)[-1])
+                key = keys[index]
+            except (ValueError, IndexError):
+                print(f"Unexpected batch part Content-ID: {content_id}")
+                continue
+            
+            if status_code == 200 and isinstance(body, dict):
+                results[key] = body.get("id")
+                print(f"Created Google Calendar event: {results[key]}")
+            elif status_code == 409 and bodies[key].get("id"):
+                # Created by an earlier attempt whose result was lost
+                results[key] = bodies[key]["id"]
+                print(f"Google Calendar event already exists: {results[key]}")
+            else:
+                print(f"Batch insert failed for {key}: {status_code} - {body}")
+        
+        return results
+    
+    async def watch_events(self, channel_id: str, address: str, token: str, ttl_seconds: int) -> Optional[Dict[str, Any]]:
+        """
+        Open a push notification channel for changes to the primary calendar's events.
+        Returns the channel resource (with resourceId and expiration in ms), or None on failure.
+        """
+        return await self.make_request(
+            "POST",
+            f"https://www.googleapis.com{CALENDAR_EVENTS_PATH}/watch",
+            {
+                "id": channel_id,
+                "type": "web_hook",
+                "address": address,
+                "token": token,
+                "params": {"ttl": str(ttl_seconds)}
+            }
+        )
+    
+    async def stop_channel(self, channel_id: str, resource_id: str) -> bool:
+        """
+        Stop a push notification channel. A channel Google no longer knows counts as stopped.
+        """
+        response = await self.send_request("POST", CHANNELS_STOP_URL, {"id": channel_id, "resourceId": resource_id})
+        return response is not None and (response.is_success or response.status_code == 404)
+
+def parse_batch_response(response: httpx.Response) -> List[tuple]:
+    """
+    Parse a multipart/mixed batch response into (content_id, status_code, json_body) tuples.
+    """
+    content_type = response.headers.get("Content-Type", "")
+    boundary = None
+    for param in content_type.split(";"):
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "boundary":
+            boundary = value.strip('"')
+    if not boundary:
+        print(f"Batch response without boundary: {content_type}")
+        return []
+    
+    parsed = []
+    text = response.text.replace("\r\n", "\n")
+    for part in text.split(f"--{boundary}"):
+        part = part.strip("\n")
+        if not part or part == "--":
+            continue
+        
+        # Outer part headers, then the embedded HTTP response
+        outer_headers, _, inner = part.partition("\n\n")
+        content_id = ""
+        for line in outer_headers.split("\n"):
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-id":
+                content_id = value.strip().strip("<>")
+        
+        status_line, _, rest = inner.partition("\n")
+        _, _, body_text = rest.partition("\n\n")
+        try:
+            status_code = int(status_line.split(" ")[1])
+        except (IndexError, ValueError):
+            status_code = 0
+        try:
+            body = json.loads(body_text) if body_text.strip() else None
+        except ValueError:
+            body = body_text
+        
+        parsed.append((content_id, status_code, body))
+    
+    return parsed
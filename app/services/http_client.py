@@ -0,0 +1,48 @@
+import httpx
+from app.config import settings
+from app.utils.loop_local import LoopLocal
+
+
+def _create_client() -> httpx.AsyncClient:
+    """
+    Build a pooled keep-alive client shared by every service on this event loop.
+    """
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+    )
+    return httpx.AsyncClient(
+        timeout=settings.HTTP_TIMEOUT,
+        limits=limits,
+        http2=settings.HTTP2_ENABLED
+    )
+
+
+async def _close_client(client: httpx.AsyncClient):
+    await client.aclose()
+
+
+_clients = LoopLocal(_create_client, _close_client)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client for the running event loop.
+    Reusing it keeps TCP/TLS connections to Notion and Google alive between calls.
+    """
+    return _clients.get()
+
+
+async def close_http_client():
+    """
+    Close the shared HTTP client of the running event loop (call on shutdown).
+    """
+    await _clients.close()
+
+
+def reset_http_clients():
+    """
+    Drop clients inherited from a parent process without closing their sockets.
+    """
+    _clients.reset()
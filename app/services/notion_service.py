@@ -1,23 +1,29 @@
 import httpx
 import asyncio
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any, Optional
 from app.services.base_service import BaseService
 
+NOTION_PAGE_SIZE = 100  # Maximum page size allowed by the Notion API
+
 class NotionService(BaseService):
     """
     Notion service for database operations.
     """
     
+    provider = "notion"
+    
     def __init__(self, access_token: str):
         super().__init__(access_token)
         self.headers["Notion-Version"] = "2022-06-28"
+        # Whether the last iter_scheduled_entries() call read every page
+        self.last_query_complete = False
     
     async def execute_action(self, action: str, data: Dict[str, Any]) -> Any:
         """
         Execute Notion-specific actions.
         """
         if action == "fetch_entries":
-            return await self.fetch_scheduled_entries(data.get("database_id"))
+            return await self.fetch_scheduled_entries(data.get("database_id"), data.get("edited_since"))
         elif action == "update_entry":
             return await self.update_entry_with_event_id(
                 data.get("entry_id"), 
@@ -27,87 +33,123 @@ class NotionService(BaseService):
         else:
             raise ValueError(f"Unknown Notion action: {action}")
     
-    async def fetch_scheduled_entries(self, database_id: str) -> List[Dict[Any, Any]]:
+    async def fetch_scheduled_entries(self, database_id: str, edited_since: Optional[str] = None) -> List[Dict[Any, Any]]:
         """
-        Fetch scheduled entries from Notion database that need to be converted to meetings
+        Fetch all scheduled entries from Notion database that need to be converted to meetings
         """
+        return [entry async for entry in self.iter_scheduled_entries(database_id, edited_since)]
+    
+    async def iter_scheduled_entries(self, database_id: str, edited_since: Optional[str] = None) -> AsyncIterator[Dict[Any, Any]]:
+        """
+        Stream scheduled entries page by page (100 per page), following next_cursor
+        until has_more is false. Entries are yielded as each page arrives.
+        With edited_since (ISO timestamp), only entries edited on or after it are returned.
+        """
+        self.last_query_complete = False
         
-        # Query for entries with Schedule = "Yes"
-        query = {
-            "filter": {
-                "and": [
-                    {
-                        "property": "Start Date",
-                        "date": {
-                            "is_not_empty": True
-                        }
-                    },
-                    {
-                        "property": "Schedule",
-                        "rich_text": {
-                            "equals": "Yes"
-                        }
-                    }
-                ]
-            }
-        }
-        
-        response_data = await self.make_request(
-            "POST",
-            f"https://api.notion.com/v1/databases/{database_id}/query",
-            query
-        )
+        # Only rows edited since the last successful poll
+        edited_filters = []
+        if edited_since:
+            edited_filters.append({
+                "timestamp": "last_edited_time",
+                "last_edited_time": {
+                    "on_or_after": edited_since
+                }
+            })
         
-        if response_data:
-            return response_data.get("results", [])
-        else:
-            # Schedule property doesn't exist, query all entries with start dates
-            print("Schedule property not found, querying all entries with start dates...")
-            simple_query = {
-                "filter": {
+        # Query for entries with Schedule = "Yes"
+        query_filter = {
+            "and": [
+                {
                     "property": "Start Date",
                     "date": {
                         "is_not_empty": True
                     }
+                },
+                {
+                    "property": "Schedule",
+                    "rich_text": {
+                        "equals": "Yes"
+                    }
                 }
-            }
+            ] + edited_filters
+        }
+        fallback_used = False
+        cursor = None
+        
+        while True:
+            query = {"filter": query_filter, "page_size": NOTION_PAGE_SIZE}
+            if cursor:
+                query["start_cursor"] = cursor
             
             response_data = await self.make_request(
                 "POST",
                 f"https://api.notion.com/v1/databases/{database_id}/query",
-                simple_query
+                query
             )
             
-            if response_data:
-                return response_data.get("results", [])
-            else:
-                print("Error fetching Notion entries")
-                return []
+            if not response_data:
+                if cursor is None and not fallback_used:
+                    # Schedule property doesn't exist, query all entries with start dates
+                    print("Schedule property not found, querying all entries with start dates...")
+                    query_filter = {
+                        "and": [
+                            {
+                                "property": "Start Date",
+                                "date": {
+                                    "is_not_empty": True
+                                }
+                            }
+                        ] + edited_filters
+                    }
+                    fallback_used = True
+                    continue
+                print("Error fetching Notion entries" if cursor is None else f"Error fetching Notion entries after cursor {cursor}")
+                return
+            
+            for entry in response_data.get("results", []):
+                yield entry
+            
+            cursor = response_data.get("next_cursor")
+            if not response_data.get("has_more") or not cursor:
+                self.last_query_complete = True
+                return
 
-    async def update_entry_with_event_id(self, page_id: str, event_id: str) -> bool:
+    async def update_entry_with_event_id(self, page_id: str, event_id: str, mark_done: bool = True,
+                                         write_event_id: bool = False) -> bool:
         """
-        Update a Notion page Schedule to mark it as processed
+        Update a Notion page Schedule to mark it as processed, and write the
+        event ID into its "Event ID" property when the database has one
         """
-        
-        # Update the page Schedule to Done
-        update_data = {
-            "properties": {
-                "Schedule": {
-                    "rich_text": [
-                        {
-                            "text": {
-                                "content": "Done"
-                            }
+        properties = {}
+        if mark_done:
+            # Update the page Schedule to Done
+            properties["Schedule"] = {
+                "rich_text": [
+                    {
+                        "text": {
+                            "content": "Done"
                         }
-                    ]
-                }
+                    }
+                ]
             }
-        }
+        if write_event_id:
+            properties["Event ID"] = {
+                "rich_text": [
+                    {
+                        "text": {
+                            "content": event_id
+                        }
+                    }
+                ]
+            }
+        if not properties:
+            return True
         
         response_data = await self.make_request(
             "PATCH",
             f"https://api.notion.com/v1/pages/{page_id}",
-            update_data
+            {"properties": properties}
         )
         
         if response_data:
@@ -116,4 +158,3 @@ class NotionService(BaseService):
         else:
             print("Failed to update Notion page")
             return False
-
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import socket
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, List, Optional, Tuple
+from app.config import settings
+from app.redis_client import get_redis
+
+MAX_LIMITERS = 10000  # Bound on tracked (provider, token) buckets
+METRICS_KEY_PREFIX = "rate-limits:"
+
+class TokenBucket:
+    """
+    Token bucket limiter for one provider/token pair.
+    Calls reserve a token up front and sleep until it is available, so a burst
+    of concurrent calls is spread out instead of hitting the provider at once.
+    A Retry-After from the provider blocks the whole bucket until it passes.
+    """
+    
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.last_wait = 0.0
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def reserve(self, cost: int = 1) -> float:
+        """
+        Take cost tokens and return how many seconds the caller must wait before using them.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= cost
+            wait = max(-self.tokens / self.rate if self.tokens < 0 else 0.0, self.blocked_until - now)
+            self.last_wait = wait
+            return wait
+    
+    def penalize(self, delay: float):
+        """
+        Block the bucket for delay seconds after the provider throttled us.
+        """
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.throttled += 1
+    
+    def current_wait(self) -> float:
+        """
+        Seconds a new call would wait right now.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            deficit = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+            return max(deficit, self.blocked_until - now, 0.0)
+    
+    async def acquire(self, cost: int = 1):
+        wait = self.reserve(cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+_limiters: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+_limiters_lock = threading.Lock()
+_metrics_published_at = 0.0
+
+def get_provider_limits(provider: str) -> Tuple[float, int]:
+    """
+    Requests per second and burst size configured for a provider.
+    """
+    limits = {
+        "notion": (settings.NOTION_RATE_LIMIT, settings.NOTION_RATE_BURST),
+        "google": (settings.GOOGLE_RATE_LIMIT, settings.GOOGLE_RATE_BURST),
+    }
+    return limits.get(provider, (settings.DEFAULT_RATE_LIMIT, settings.DEFAULT_RATE_BURST))
+
+def get_rate_limiter(provider: str, access_token: str) -> TokenBucket:
+    """
+    Get the limiter for a provider and access token (one bucket per integration).
+    """
+    key = (provider, hashlib.sha256((access_token or "").encode()).hexdigest()[:16])
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = TokenBucket(*get_provider_limits(provider))
+            _limiters[key] = limiter
+            if len(_limiters) > MAX_LIMITERS:
+                _limiters.popitem(last=False)
+        else:
+            _limiters.move_to_end(key)
+        return limiter
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given either in seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), settings.RATE_LIMIT_MAX_RETRY_AFTER)
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with jitter so retries from concurrent calls do not line up.
+    """
+    delay = min(settings.RATE_LIMIT_BACKOFF_BASE * (2 ** attempt), settings.RATE_LIMIT_BACKOFF_MAX)
+    return random.uniform(delay / 2, delay)
+
+def get_rate_limit_metrics() -> List[Dict[str, Any]]:
+    """
+    Current state of every limiter in this process.
+    """
+    with _limiters_lock:
+        items = list(_limiters.items())
+    return [
+        {
+            "provider": provider,
+            "token": token_hash,
+            "wait_seconds": round(limiter.current_wait(), 3),
+            "last_wait_seconds": round(limiter.last_wait, 3),
+            "throttled": limiter.throttled
+        }
+        for (provider, token_hash), limiter in items
+    ]
+
+async def publish_rate_limit_metrics():
+    """
+    Publish this process's limiter state to Redis, at most once per
+    RATE_LIMIT_METRICS_INTERVAL. Limiters live in the worker processes that make
+    the provider calls, so the API reads their published snapshots.
+    """
+    global _metrics_published_at
+    now = time.monotonic()
+    if now - _metrics_published_at < settings.RATE_LIMIT_METRICS_INTERVAL:
+        return
+    _metrics_published_at = now
+    try:
+        await get_redis().set(
+            f"{METRICS_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}",
+            json.dumps(get_rate_limit_metrics()),
+            ex=settings.RATE_LIMIT_METRICS_TTL
+        )
+    except Exception as e:
+        print(f"Error publishing rate limit metrics: {str(e)}")
+
+async def read_rate_limit_metrics() -> List[Dict[str, Any]]:
+    """
+    Limiter state published by every live worker process.
+    """
+    redis = get_redis()
+    metrics = []
+    async for key in redis.scan_iter(match=f"{METRICS_KEY_PREFIX}*"):
+        snapshot = await redis.get(key)
+        if not snapshot:
+            continue
+        process = key[len(METRICS_KEY_PREFIX):]
+        for limiter in json.loads(snapshot):
+            metrics.append({**limiter, "process": process})
+    return metrics
@@ -1,7 +1,10 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+from datetime import datetime, timezone
 from app.utils.simple_logging import log_workflow_execution, log_error
-from app.database import supabase
+from app.utils.log_sink import request_log_flush
+from app.utils.progress import publish_progress
+from app.repository import repository
 import asyncio
 
 class BaseTask(ABC):
@@ -10,9 +13,16 @@ class BaseTask(ABC):
     Provides common functionality and logging for all tasks.
     """
     
+    # Apps whose change events (webhooks) should trigger this task for the affected user
+    trigger_apps: Tuple[str, ...] = ()
+    # Integrations a user needs before this task can run
+    required_providers: Tuple[str, ...] = ()
+    
     def __init__(self, workflow_id: int, workflow_name: str):
         self.workflow_id = workflow_id
         self.workflow_name = workflow_name
+        # Optional hook that also receives every progress event (e.g. to report Celery job state)
+        self.progress_callback: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None
     
     @abstractmethod
     async def execute(self, user_id: str) -> Dict[str, Any]:
@@ -28,8 +38,7 @@ class BaseTask(ABC):
         Get user's integrations for this workflow.
         """
         try:
-            integrations_response = supabase.table("user_integrations").select("*").eq("user_id", user_id).execute()
-            integrations = integrations_response.data
+            integrations = await repository.get_integrations(user_id)
             
             # Group by provider
             user_integrations = {}
@@ -41,11 +50,49 @@ class BaseTask(ABC):
             print(f"Failed to get integrations for user {user_id}: {str(e)}")
             return {}
     
-    def log_success(self, user_id: str, description: str, items_processed: int = 0, items_created: int = 0):
+    async def get_sync_watermark(self, user_id: str, source_id: str) -> Optional[str]:
+        """
+        Get the last_edited_time watermark for a user's source database, if any.
+        """
+        try:
+            return await repository.get_sync_watermark(user_id, source_id)
+        except Exception as e:
+            print(f"Failed to get sync watermark for user {user_id}: {str(e)}")
+        return None
+    
+    async def advance_sync_watermark(self, user_id: str, source_id: str, watermark: str):
+        """
+        Atomically move the watermark forward (never backwards) after a successful run.
+        """
+        try:
+            await repository.advance_sync_watermark(user_id, source_id, watermark)
+        except Exception as e:
+            print(f"Failed to advance sync watermark for user {user_id}: {str(e)}")
+    
+    async def get_event_mappings(self, user_id: str, page_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Already-created events of the given source pages, keyed by page ID.
+        Raises on failure: creating events without this check could duplicate them.
+        """
+        return await repository.get_event_mappings(user_id, page_ids)
+    
+    async def save_event_mappings(self, user_id: str, mappings: List[Dict[str, Any]]) -> bool:
+        """
+        Record source page -> event mappings (with content hashes) for idempotent retries.
+        """
+        try:
+            now = datetime.now(timezone.utc).isoformat()
+            await repository.upsert_event_mappings([{"user_id": user_id, "updated_at": now, **mapping} for mapping in mappings])
+            return True
+        except Exception as e:
+            print(f"Failed to save event mappings for user {user_id}: {str(e)}")
+            return False
+    
+    async def log_success(self, user_id: str, description: str, items_processed: int = 0, items_created: int = 0):
         """
         Log successful workflow execution.
         """
-        log_workflow_execution(
+        await log_workflow_execution(
             user_id=user_id,
             workflow_id=self.workflow_id,
             workflow_name=self.workflow_name,
@@ -55,11 +102,11 @@ class BaseTask(ABC):
             success=True
         )
     
-    def log_error(self, user_id: str, step_type: str, app: str, description: str, error: str):
+    async def log_error(self, user_id: str, step_type: str, app: str, description: str, error: str):
         """
         Log workflow execution error.
         """
-        log_error(
+        await log_error(
             user_id=user_id,
             workflow_id=self.workflow_id,
             step_type=step_type,
@@ -68,6 +115,17 @@ class BaseTask(ABC):
             error=error
         )
     
+    async def publish_progress(self, user_id: str, event: str, **data: Any):
+        """
+        Push a live progress event for this workflow to the user's dashboard stream.
+        """
+        await publish_progress(user_id, event, workflow_id=self.workflow_id, workflow_name=self.workflow_name, **data)
+        if self.progress_callback:
+            try:
+                await self.progress_callback(event, data)
+            except Exception as e:
+                print(f"Warning: Progress callback failed for user {user_id}: {str(e)}")
+    
     def log_start(self, user_id: str):
         """
         Log workflow start.
@@ -87,13 +145,14 @@ class BaseTask(ABC):
         """
         try:
             self.log_start(user_id)
+            await self.publish_progress(user_id, "started")
             
             # Execute the task
             results = await self.execute(user_id)
             
             # Log success
             if results.get("success", False):
-                self.log_success(
+                await self.log_success(
                     user_id=user_id,
                     description=results.get("description", f"Completed {self.workflow_name}"),
                     items_processed=results.get("items_processed", 0),
@@ -101,22 +160,34 @@ class BaseTask(ABC):
                 )
             
             self.log_completion(user_id, results)
+            await self.publish_progress(
+                user_id,
+                "completed" if results.get("success", False) else "failed",
+                description=results.get("description"),
+                error=results.get("error"),
+                items_processed=results.get("items_processed", 0),
+                items_created=results.get("items_created", 0)
+            )
             return results
             
         except Exception as e:
             error_msg = f"Failed to execute {self.workflow_name}: {str(e)}"
             print(f"❌ {error_msg}")
             
-            self.log_error(
+            await self.log_error(
                 user_id=user_id,
                 step_type="trigger",
                 app="system",
                 description=f"Workflow execution failed: {self.workflow_name}",
                 error=str(e)
             )
+            await self.publish_progress(user_id, "failed", description=f"Failed to execute {self.workflow_name}", error=str(e))
             
             return {
                 "success": False,
                 "error": str(e),
                 "description": f"Failed to execute {self.workflow_name}"
-            } 
\ No newline at end of file
+            }
+        finally:
+            # Write this run's buffered log records in bulk, in the background
+            request_log_flush() 
\ No newline at end of file
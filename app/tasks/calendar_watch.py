@@ -0,0 +1,105 @@
+import asyncio
+import secrets
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict
+from app.auth import get_valid_google_token
+from app.config import settings
+from app.repository import repository
+from app.services.google_service import GoogleService
+from app.tasks.fan_out import get_eligible_user_ids
+from app.tasks.task_factory import TaskFactory
+from app.tasks.triggers import get_triggered_workflows
+
+def watch_address() -> str:
+    return f"{settings.WEBHOOK_BASE_URL.rstrip('/')}/webhooks/google/calendar"
+
+async def open_watch_channel(user_id: str) -> bool:
+    """
+    Open a push channel on the user's primary calendar and store it for routing and renewal.
+    """
+    try:
+        google_service = GoogleService(await get_valid_google_token(user_id))
+        channel_id = str(uuid.uuid4())
+        channel_token = secrets.token_urlsafe(32)
+        
+        channel = await google_service.watch_events(channel_id, watch_address(), channel_token, settings.GOOGLE_WATCH_TTL)
+        if not channel:
+            print(f"❌ Failed to open calendar watch channel for user {user_id}")
+            return False
+        
+        if channel.get("expiration"):
+            expires_at = datetime.fromtimestamp(int(channel["expiration"]) / 1000, tz=timezone.utc)
+        else:
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=settings.GOOGLE_WATCH_TTL)
+        
+        await repository.create_watch_channel({
+            "id": channel_id,
+            "user_id": user_id,
+            "calendar_id": "primary",
+            "resource_id": channel["resourceId"],
+            "token": channel_token,
+            "expires_at": expires_at.isoformat()
+        })
+        return True
+    except Exception as e:
+        print(f"❌ Failed to open calendar watch channel for user {user_id}: {str(e)}")
+        return False
+
+async def close_watch_channel(channel: Dict[str, Any]):
+    """
+    Stop a push channel at Google (best effort) and forget it.
+    """
+    try:
+        google_service = GoogleService(await get_valid_google_token(str(channel["user_id"])))
+        await google_service.stop_channel(channel["id"], channel["resource_id"])
+    except Exception as e:
+        print(f"Warning: Failed to stop calendar watch channel {channel['id']}: {str(e)}")
+    await repository.delete_watch_channel(channel["id"])
+
+async def renew_watch_channels() -> Dict[str, Any]:
+    """
+    Keep exactly one live push channel per user of a Google-triggered workflow.
+    Channels expiring within GOOGLE_WATCH_RENEW_BEFORE are replaced; the old one is
+    only stopped once its replacement is open, so no change goes unnoticed.
+    """
+    if not settings.WEBHOOK_BASE_URL:
+        return {"skipped": "WEBHOOK_BASE_URL is not set"}
+    
+    wanted = set()
+    for task_type, workflow_id, _ in await get_triggered_workflows("google"):
+        task_class = TaskFactory.get_task_class(task_type)
+        wanted.update(await get_eligible_user_ids(workflow_id, list(task_class.required_providers)))
+    
+    renew_before = datetime.now(timezone.utc) + timedelta(seconds=settings.GOOGLE_WATCH_RENEW_BEFORE)
+    channels = await repository.list_watch_channels()
+    covered = {
+        str(channel["user_id"]) for channel in channels
+        if datetime.fromisoformat(channel["expires_at"].replace("Z", "+00:00")) > renew_before
+    }
+    
+    semaphore = asyncio.Semaphore(settings.TOKEN_REFRESH_CONCURRENCY)
+    
+    async def open_one(user_id: str) -> bool:
+        async with semaphore:
+            return await open_watch_channel(user_id)
+    
+    to_open = sorted(wanted - covered)
+    results = await asyncio.gather(*(open_one(user_id) for user_id in to_open))
+    covered.update(user_id for user_id, opened in zip(to_open, results) if opened)
+    
+    closed = 0
+    for channel in channels:
+        user_id = str(channel["user_id"])
+        expires_at = datetime.fromisoformat(channel["expires_at"].replace("Z", "+00:00"))
+        # Drop channels of users who no longer need one, and expiring channels that were replaced
+        if user_id not in wanted or (user_id in covered and expires_at <= renew_before):
+            await close_watch_channel(channel)
+            closed += 1
+    
+    return {
+        "users": len(wanted),
+        "opened": results.count(True),
+        "failed": results.count(False),
+        "closed": closed
+    }
@@ -0,0 +1,109 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List
+from app.redis_client import get_redis
+from app.config import settings
+from app.tasks.task_factory import TaskFactory
+from app.utils.simple_logging import log_error
+from app.repository import repository
+
+async def get_eligible_user_ids(workflow_id: int, required_providers: List[str]) -> List[str]:
+    """
+    Get users that have every required integration and have not deactivated the workflow.
+    """
+    integrations = await repository.list_integrations("user_id, provider")
+    print(f"Found {len(integrations)} integrations")
+    
+    # Group providers by user
+    user_providers = {}
+    for integration in integrations:
+        user_providers.setdefault(integration["user_id"], set()).add(integration["provider"])
+    
+    # Users who explicitly deactivated this workflow are skipped
+    inactive_users = set(await repository.get_inactive_workflow_user_ids(workflow_id))
+    
+    return [
+        user_id for user_id, providers in user_providers.items()
+        if set(required_providers) <= providers and str(user_id) not in inactive_users
+    ]
+
+@asynccontextmanager
+async def user_run_lock(task_type: str, user_id: str):
+    """
+    Per-user Redis lock shared by scheduled polls and webhook-triggered runs.
+    Yields False (without waiting) when another run holds it.
+    Falls back to running unlocked when Redis is unavailable.
+    """
+    lock = None
+    acquired = True
+    try:
+        lock = get_redis().lock(f"lock:user-run:{task_type}:{user_id}", timeout=settings.POLL_LEASE_SECONDS)
+        if not await lock.acquire(blocking=False):
+            lock = None
+            acquired = False
+    except Exception as e:
+        print(f"Warning: Run lock for user {user_id} unavailable: {e}")
+        lock = None
+    try:
+        yield acquired
+    finally:
+        if lock is not None:
+            try:
+                await lock.release()
+            except Exception as e:
+                print(f"Warning: Failed to release run lock for user {user_id}: {e}")
+
+async def run_task_for_user(task_type: str, workflow_id: int, workflow_name: str, user_id: str,
+                            timeout: float) -> Dict[str, Any]:
+    """
+    Run one user's workflow task with a timeout, never raising.
+    """
+    task = TaskFactory.create_task(task_type, workflow_id, workflow_name)
+    if not task:
+        print(f"Failed to create task for user {user_id}")
+        return {"success": False, "error": f"Unknown task type: {task_type}"}
+    
+    try:
+        return await asyncio.wait_for(task.run_with_logging(user_id), timeout=timeout)
+    except asyncio.TimeoutError:
+        error = f"Timed out after {timeout:.0f}s"
+        print(f"Task timed out for user {user_id}")
+        await log_error(user_id, workflow_id, "trigger", "system", f"Workflow timed out for user {user_id}", error)
+        return {"success": False, "error": error}
+    except Exception as e:
+        print(f"Error processing user {user_id}: {str(e)}")
+        await log_error(user_id, workflow_id, "trigger", "system", f"Failed to process user {user_id}", str(e))
+        return {"success": False, "error": str(e)}
+
+async def run_task_for_users(task_type: str, workflow_id: int, workflow_name: str, user_ids: List[str],
+                             max_concurrency: int = None, timeout: float = None) -> Dict[str, int]:
+    """
+    Run a workflow task for many users concurrently with bounded concurrency.
+    A slow user only holds one slot instead of stalling everyone behind it.
+    Returns aggregated counters.
+    """
+    max_concurrency = max_concurrency or settings.POLL_MAX_CONCURRENCY
+    timeout = timeout or settings.POLL_USER_TIMEOUT
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def run_one(user_id: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await run_task_for_user(task_type, workflow_id, workflow_name, user_id, timeout)
+    
+    results = await asyncio.gather(*(run_one(user_id) for user_id in user_ids))
+    
+    summary = {
+        "users_total": len(user_ids),
+        "users_processed": 0,
+        "users_failed": 0,
+        "meetings_processed": 0
+    }
+    for user_id, result in zip(user_ids, results):
+        if result.get("success", False):
+            summary["users_processed"] += 1
+            summary["meetings_processed"] += result.get("items_created", 0)
+        else:
+            summary["users_failed"] += 1
+            print(f"Task failed for user {user_id}: {result.get('error', 'Unknown error')}")
+    
+    return summary
@@ -0,0 +1,116 @@
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+from app.redis_client import get_redis
+from app.tasks.fan_out import get_eligible_user_ids
+from app.tasks.task_factory import TaskFactory
+
+# Atomically take the due users and push their score out by the lease,
+# so overlapping ticks never dispatch the same user twice
+CLAIM_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[3])
+for _, member in ipairs(due) do
+    redis.call('ZADD', KEYS[1], 'XX', ARGV[2], member)
+end
+return due
+"""
+
+def schedule_key(task_type: str) -> str:
+    return f"poll:schedule:{task_type}"
+
+def interval_key(task_type: str) -> str:
+    return f"poll:interval:{task_type}"
+
+def jittered(interval: float) -> float:
+    """Spread start times so users polled together drift apart"""
+    return interval * random.uniform(1 - settings.POLL_JITTER, 1 + settings.POLL_JITTER)
+
+def next_interval(current: float, result: Dict[str, Any]) -> float:
+    """
+    Shorten the interval after a poll that found work; back off exponentially when idle or failing.
+    """
+    # Unchanged entries skipped by their content hash are not work
+    if result.get("success", False) and result.get("items_processed", 0) > result.get("items_skipped", 0):
+        interval = current * settings.POLL_ACTIVE_FACTOR
+    else:
+        interval = current * settings.POLL_BACKOFF_FACTOR
+    return min(max(interval, settings.POLL_MIN_INTERVAL), settings.POLL_MAX_INTERVAL)
+
+async def sync_scheduled_users(task_type: str, workflow_id: int, force: bool = False) -> Optional[Dict[str, int]]:
+    """
+    Add newly eligible users (first poll spread over one base interval) and drop users who left.
+    Runs at most once per POLL_RESYNC_INTERVAL across all workers unless forced.
+    """
+    redis = get_redis()
+    if not force and not await redis.set(f"poll:resync:{task_type}", 1, nx=True, ex=settings.POLL_RESYNC_INTERVAL):
+        return None
+    
+    task_class = TaskFactory.get_task_class(task_type)
+    eligible = set(await get_eligible_user_ids(workflow_id, list(task_class.required_providers)))
+    scheduled = set(await redis.zrange(schedule_key(task_type), 0, -1))
+    
+    now = time.time()
+    added = eligible - scheduled
+    removed = scheduled - eligible
+    if added:
+        # NX: never reset a user who was scheduled meanwhile
+        await redis.zadd(schedule_key(task_type), {
+            user_id: now + random.uniform(0, settings.POLL_INTERVAL) for user_id in added
+        }, nx=True)
+    if removed:
+        await redis.zrem(schedule_key(task_type), *removed)
+        await redis.hdel(interval_key(task_type), *removed)
+    
+    return {"added": len(added), "removed": len(removed), "scheduled": len(eligible)}
+
+async def claim_due_users(task_type: str, limit: int = None) -> Tuple[List[str], float]:
+    """
+    Users whose next poll time has passed, leased until the returned score.
+    Each dispatched poll carries that score, so a poll that sat in the queue
+    past its lease can tell it was superseded by a later claim.
+    """
+    now = time.time()
+    lease_until = round(now + settings.POLL_LEASE_SECONDS, 3)
+    user_ids = await get_redis().eval(
+        CLAIM_DUE_SCRIPT, 1, schedule_key(task_type),
+        now, lease_until, limit or settings.POLL_DISPATCH_BATCH
+    )
+    return user_ids, lease_until
+
+async def start_claimed_poll(task_type: str, user_id: str, lease_until: float) -> bool:
+    """
+    Confirm a dispatched poll still owns its claim and extend the lease to cover the run.
+    False if the user was re-claimed, rescheduled or removed since dispatch.
+    """
+    redis = get_redis()
+    score = await redis.zscore(schedule_key(task_type), user_id)
+    if score is None or abs(score - lease_until) > 0.001:
+        return False
+    await redis.zadd(schedule_key(task_type), {user_id: time.time() + settings.POLL_LEASE_SECONDS}, xx=True)
+    return True
+
+async def record_poll_result(task_type: str, user_id: str, result: Dict[str, Any]) -> Optional[float]:
+    """
+    Reschedule a user after a poll based on its outcome. Returns the new interval.
+    """
+    redis = get_redis()
+    current = await redis.hget(interval_key(task_type), user_id)
+    interval = next_interval(float(current) if current else settings.POLL_INTERVAL, result)
+    
+    # XX: a user removed by a resync while its poll ran stays removed
+    if not await redis.zadd(schedule_key(task_type), {user_id: time.time() + jittered(interval)}, xx=True, ch=True):
+        return None
+    await redis.hset(interval_key(task_type), user_id, interval)
+    return interval
+
+async def reschedule_user(task_type: str, user_id: str) -> Optional[float]:
+    """
+    Reschedule a user at their current interval without a poll outcome. Returns the interval.
+    """
+    redis = get_redis()
+    current = await redis.hget(interval_key(task_type), user_id)
+    interval = float(current) if current else settings.POLL_INTERVAL
+    if not await redis.zadd(schedule_key(task_type), {user_id: time.time() + jittered(interval)}, xx=True, ch=True):
+        return None
+    return interval
@@ -1,4 +1,4 @@
-from typing import Dict, Type, Optional
+from typing import Any, Dict, Type, Optional
 from app.tasks.base_task import BaseTask
 from app.tasks.workflow_tasks import NotionToGoogleTask
 
@@ -9,13 +9,37 @@ class TaskFactory:
     """
     
     _tasks: Dict[str, Type[BaseTask]] = {}
+    _workflow_types: Dict[str, str] = {}
     
     @classmethod
-    def register_task(cls, task_type: str, task_class: Type[BaseTask]):
+    def register_task(cls, task_type: str, task_class: Type[BaseTask], workflow_name: Optional[str] = None):
         """
-        Register a new task type.
+        Register a new task type, optionally bound to the name of its row in the workflows table.
         """
         cls._tasks[task_type] = task_class
+        if workflow_name:
+            cls._workflow_types[workflow_name] = task_type
+    
+    @classmethod
+    def task_type_for_workflow(cls, workflow_name: str) -> Optional[str]:
+        """
+        Resolve a workflow's task type from its name (e.g. "Notion to Google Meet" -> "notion_to_google").
+        """
+        return cls._workflow_types.get(workflow_name)
+    
+    @classmethod
+    def get_task_class(cls, task_type: str) -> Optional[Type[BaseTask]]:
+        return cls._tasks.get(task_type)
+    
+    @classmethod
+    def create_task_for_workflow(cls, workflow: Dict[str, Any]) -> Optional[BaseTask]:
+        """
+        Create the task instance for a workflows table row.
+        """
+        task_type = cls.task_type_for_workflow(workflow["name"])
+        if not task_type:
+            return None
+        return cls.create_task(task_type, workflow["id"], workflow["name"])
     
     @classmethod
     def create_task(cls, task_type: str, workflow_id: int, workflow_name: str) -> Optional[BaseTask]:
@@ -49,4 +73,4 @@ class TaskFactory:
         return list(cls._tasks.keys())
 
 # Register default tasks
-TaskFactory.register_task("notion_to_google", NotionToGoogleTask) 
\ No newline at end of file
+TaskFactory.register_task("notion_to_google", NotionToGoogleTask, workflow_name="Notion to Google Meet") 
\ No newline at end of file
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Dict, List, Tuple
+from app.celery import celery_app
+from app.config import settings
+from app.redis_client import get_redis
+from app.repository import repository
+from app.tasks.task_factory import TaskFactory
+from app.utils.cache import TTLCache
+
+# The workflows table rarely changes; don't read it on every webhook
+_workflows_cache = TTLCache(maxsize=1, ttl=300)
+
+async def get_triggered_workflows(app: str) -> List[Tuple[str, int, str]]:
+    """
+    (task_type, workflow_id, workflow_name) of every workflow whose task is triggered by changes in the app.
+    """
+    workflows = _workflows_cache.get("workflows")
+    if workflows is None:
+        workflows = await repository.list_workflows()
+        _workflows_cache.set("workflows", workflows)
+    
+    triggered = []
+    for workflow in workflows:
+        task_type = TaskFactory.task_type_for_workflow(workflow["name"])
+        task_class = TaskFactory.get_task_class(task_type) if task_type else None
+        if task_class and app in task_class.trigger_apps:
+            triggered.append((task_type, workflow["id"], workflow["name"]))
+    return triggered
+
+async def claim_webhook_event(source: str, event_id: str) -> bool:
+    """
+    Returns True the first time an event is seen; providers deliver at least once.
+    """
+    try:
+        return bool(await get_redis().set(f"webhook-event:{source}:{event_id}", 1, nx=True, ex=settings.WEBHOOK_DEDUPE_TTL))
+    except Exception as e:
+        # Rather run twice than lose the change
+        print(f"Warning: Could not deduplicate {source} webhook event {event_id}: {str(e)}")
+        return True
+
+async def release_webhook_event(source: str, event_id: str):
+    """
+    Forget a claimed event whose processing failed, so the provider's retry is handled.
+    """
+    try:
+        await get_redis().delete(f"webhook-event:{source}:{event_id}")
+    except Exception as e:
+        print(f"Warning: Could not release {source} webhook event {event_id}: {str(e)}")
+
+async def _claim_debounce(task_type: str, user_id: str) -> bool:
+    try:
+        return bool(await get_redis().set(f"webhook-debounce:{task_type}:{user_id}", 1, nx=True, ex=settings.WEBHOOK_DEBOUNCE_SECONDS))
+    except Exception as e:
+        print(f"Warning: Could not debounce {task_type} for user {user_id}: {str(e)}")
+        return True
+
+async def trigger_user_workflows(app: str, user_ids: List[str]) -> Dict[str, int]:
+    """
+    Enqueue a targeted run of every workflow triggered by the app, for each affected user.
+    Runs are delayed by WEBHOOK_DEBOUNCE_SECONDS, and a burst of changes for the same user
+    within that window is coalesced into the one queued run.
+    """
+    counts = {"users": len(user_ids), "triggered": 0, "debounced": 0}
+    if not user_ids:
+        return counts
+    
+    for task_type, workflow_id, workflow_name in await get_triggered_workflows(app):
+        inactive_users = set(await repository.get_inactive_workflow_user_ids(workflow_id))
+        for user_id in user_ids:
+            if user_id in inactive_users:
+                continue
+            if not await _claim_debounce(task_type, user_id):
+                counts["debounced"] += 1
+                continue
+            
+            # Publishing to the broker is blocking; keep it off the event loop
+            await asyncio.to_thread(
+                celery_app.send_task,
+                "app.main_tasks.execute_triggered_workflow",
+                args=(task_type, workflow_id, workflow_name, user_id),
+                countdown=settings.WEBHOOK_DEBOUNCE_SECONDS
+            )
+            counts["triggered"] += 1
+    
+    return counts
@@ -1,17 +1,34 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from app.tasks.base_task import BaseTask
 from app.services.notion_service import NotionService
-from app.services.google_service import GoogleService
+from app.services.google_service import GoogleService, make_event_id
 
 from app.auth import get_valid_google_token
+from app.config import settings
+from datetime import datetime, timezone, timedelta
+import asyncio
+import hashlib
 import json
 
+def fingerprint_meeting(meeting: Dict[str, Any]) -> str:
+    """
+    Compact hash of the fields that end up in the calendar event (title, dates, attendees).
+    """
+    content = json.dumps([meeting["summary"], meeting["start_time"], meeting["end_time"], sorted(meeting["attendees"])])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+
+def rich_text_content(prop: Dict[str, Any]) -> str:
+    return "".join(part.get("plain_text") or part.get("text", {}).get("content", "") for part in prop.get("rich_text", []))
+
 class NotionToGoogleTask(BaseTask):
     """
     Notion to Google Calendar workflow task.
     Fetches scheduled entries from Notion and creates Google Calendar events.
     """
     
+    trigger_apps = ("notion",)
+    required_providers = ("notion", "google")
+    
     def __init__(self, workflow_id: int, workflow_name: str):
         super().__init__(workflow_id, workflow_name)
     
@@ -54,7 +71,7 @@ class NotionToGoogleTask(BaseTask):
             try:
                 google_token = await get_valid_google_token(user_id)
             except Exception as e:
-                self.log_error(user_id, "trigger", "google", f"Failed to get Google token", str(e))
+                await self.log_error(user_id, "trigger", "google", f"Failed to get Google token", str(e))
                 return {
                     "success": False,
                     "error": f"Failed to get Google token: {str(e)}",
@@ -65,18 +82,81 @@ class NotionToGoogleTask(BaseTask):
             notion_service = NotionService(notion_token)
             google_service = GoogleService(google_token)
             
-            # Fetch entries from Notion
+            # Only look at rows edited since the last successful poll
+            poll_started_at = datetime.now(timezone.utc)
+            watermark = None
+            if settings.NOTION_INCREMENTAL_POLLING:
+                watermark = await self.get_sync_watermark(user_id, notion_db_id)
+            
+            # Stream entries from Notion and schedule them as each page arrives.
+            # Batches run as a pipeline: Google inserts and Notion updates of different
+            # batches overlap, each capped by its own provider limit.
+            items_processed = 0
+            meetings_scheduled = 0
+            entries_failed = 0
+            entries_skipped = 0
+            pending = []
+            in_flight = set()
+            google_slots = asyncio.Semaphore(settings.GOOGLE_MAX_CONCURRENCY)
+            notion_slots = asyncio.Semaphore(settings.NOTION_MAX_CONCURRENCY)
+            
+            def collect(done):
+                nonlocal meetings_scheduled, entries_failed, entries_skipped
+                for finished in done:
+                    counts = finished.result()
+                    meetings_scheduled += counts["scheduled"]
+                    entries_failed += counts["failed"]
+                    entries_skipped += counts["skipped"]
+            
+            async def flush_pending():
+                batch = list(pending)
+                pending.clear()
+                in_flight.add(asyncio.create_task(
+                    self.schedule_batch(user_id, batch, notion_service, google_service, google_slots, notion_slots)
+                ))
+                # Bound the number of queued batches so memory stays flat on large databases
+                if len(in_flight) >= settings.GOOGLE_MAX_CONCURRENCY * 2:
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    in_flight.difference_update(done)
+                    collect(done)
+            
             try:
-                entries = await notion_service.fetch_scheduled_entries(notion_db_id)
+                async for entry in notion_service.iter_scheduled_entries(notion_db_id, edited_since=watermark):
+                    items_processed += 1
+                    meeting = await self.parse_entry(user_id, entry)
+                    if meeting == "failed":
+                        entries_failed += 1
+                        await self.publish_progress(user_id, "entry_failed", entry_id=entry.get("id"), items_processed=items_processed)
+                    elif meeting:
+                        # Insert events in batches: one Google round trip per batch
+                        pending.append(meeting)
+                        if len(pending) >= settings.GOOGLE_BATCH_SIZE:
+                            await flush_pending()
+                if pending:
+                    await flush_pending()
+                if in_flight:
+                    done, _ = await asyncio.wait(in_flight)
+                    in_flight.clear()
+                    collect(done)
             except Exception as e:
-                self.log_error(user_id, "trigger", "notion", "Failed to fetch Notion entries", str(e))
+                await self.log_error(user_id, "trigger", "notion", "Failed to fetch Notion entries", str(e))
                 return {
                     "success": False,
                     "error": f"Failed to fetch Notion entries: {str(e)}",
                     "description": "Notion API error"
                 }
+            finally:
+                # Timeouts/cancellation must not leave batches running in the background
+                for running in in_flight:
+                    running.cancel()
+            
+            # Advance the watermark only when every page was read and no entry needs a retry.
+            # Notion rounds last_edited_time to the minute, hence the skew margin.
+            if settings.NOTION_INCREMENTAL_POLLING and notion_service.last_query_complete and not entries_failed:
+                new_watermark = poll_started_at - timedelta(seconds=settings.NOTION_WATERMARK_SKEW_SECONDS)
+                await self.advance_sync_watermark(user_id, notion_db_id, new_watermark.isoformat())
             
-            if not entries:
+            if not items_processed:
                 return {
                     "success": True,
                     "description": "No entries to process",
@@ -84,71 +164,230 @@ class NotionToGoogleTask(BaseTask):
                     "items_created": 0
                 }
             
-            # Process each entry
-            meetings_scheduled = 0
-            for entry in entries:
-                try:
-                    # Extract entry data
-                    properties = entry.get("properties", {})
-                    
-                    title = properties.get("Name", {}).get("title", [{}])[0].get("text", {}).get("content", "Untitled Meeting")
-                    
-                    start_date_prop = properties.get("Start Date", {})
-                    start = start_date_prop.get("date", {}).get("start") if start_date_prop.get("type") == "date" else None
-                    
-                    end_date_prop = properties.get("End Date", {})
-                    end = end_date_prop.get("date", {}).get("start") if end_date_prop.get("type") == "date" else None
-                    
-                    attendees_prop = properties.get("Attendees", {}).get("rich_text", [{}])[0].get("text", {}).get("content", "")
-                    
-                    if not start or not end:
-                        print(f"Skipping entry {entry.get('id')}: Missing start or end date")
-                        continue
-                    
-                    # Process attendees
-                    if attendees_prop:
-                        attendees = [email.strip() for email in attendees_prop.replace('\n', ',').replace(';', ',').split(',') if email.strip()]
-                    else:
-                        attendees = []
-                    
-                    print(f"Scheduling: {title} for {attendees}")
-                    
-                    # Create Google Calendar event
-                    event_id = await google_service.create_event(
-                        summary=title,
-                        start_time=start,
-                        end_time=end,
-                        attendees=attendees
-                    )
-                    
-                    # Update Notion with event ID
-                    if event_id:
-                        success = await notion_service.update_entry_with_event_id(entry["id"], event_id)
-                        if success:
-                            meetings_scheduled += 1
-                            print(f"✅ Scheduled meeting: {title}")
-                        else:
-                            self.log_error(user_id, "action", "notion", f"Failed to update Notion for meeting: {title}", "Update failed")
-                    else:
-                        self.log_error(user_id, "action", "google", f"Failed to create Google Calendar event for: {title}", "Event creation failed")
-                        
-                except Exception as e:
-                    self.log_error(user_id, "action", "system", f"Failed to process meeting entry {entry.get('id')}", str(e))
-                    continue
-            
             return {
                 "success": True,
-                "description": f"Processed {len(entries)} Notion entries, scheduled {meetings_scheduled} meetings",
-                "items_processed": len(entries),
-                "items_created": meetings_scheduled
+                "description": f"Processed {items_processed} Notion entries, scheduled {meetings_scheduled} meetings, skipped {entries_skipped} unchanged",
+                "items_processed": items_processed,
+                "items_created": meetings_scheduled,
+                "items_skipped": entries_skipped
             }
             
         except Exception as e:
-            self.log_error(user_id, "trigger", "system", "Workflow execution failed", str(e))
+            await self.log_error(user_id, "trigger", "system", "Workflow execution failed", str(e))
             return {
                 "success": False,
                 "error": str(e),
                 "description": "Workflow execution failed"
             }
-
- 
\ No newline at end of file
+    
+    async def parse_entry(self, user_id: str, entry: Dict[str, Any]):
+        """
+        Extract meeting details from a Notion entry.
+        Returns a meeting dict, None when the entry has nothing to schedule,
+        or "failed" when it could not be parsed.
+        """
+        try:
+            # Extract entry data
+            properties = entry.get("properties", {})
+            
+            title = properties.get("Name", {}).get("title", [{}])[0].get("text", {}).get("content", "Untitled Meeting")
+            
+            start_date_prop = properties.get("Start Date", {})
+            start = start_date_prop.get("date", {}).get("start") if start_date_prop.get("type") == "date" else None
+            
+            end_date_prop = properties.get("End Date", {})
+            end = end_date_prop.get("date", {}).get("start") if end_date_prop.get("type") == "date" else None
+            
+            attendees_prop = properties.get("Attendees", {}).get("rich_text", [{}])[0].get("text", {}).get("content", "")
+            
+            if not start or not end:
+                print(f"Skipping entry {entry.get('id')}: Missing start or end date")
+                return None
+            
+            # Process attendees
+            if attendees_prop:
+                attendees = [email.strip() for email in attendees_prop.replace('\n', ',').replace(';', ',').split(',') if email.strip()]
+            else:
+                attendees = []
+            
+            meeting = {
+                "key": entry["id"],
+                "summary": title,
+                "start_time": start,
+                "end_time": end,
+                "attendees": attendees,
+                # Databases without a text Schedule property are read by the fallback query
+                "mark_done": properties.get("Schedule", {}).get("type") == "rich_text",
+                "has_event_id_property": properties.get("Event ID", {}).get("type") == "rich_text",
+                "notion_event_id": rich_text_content(properties.get("Event ID", {})) or None
+            }
+            meeting["content_hash"] = fingerprint_meeting(meeting)
+            return meeting
+            
+        except Exception as e:
+            await self.log_error(user_id, "action", "system", f"Failed to process meeting entry {entry.get('id')}", str(e))
+            return "failed"
+    
+    async def schedule_batch(self, user_id: str, meetings: List[Dict[str, Any]],
+                             notion_service: NotionService, google_service: GoogleService,
+                             google_slots: asyncio.Semaphore, notion_slots: asyncio.Semaphore) -> Dict[str, int]:
+        """
+        Create Google Calendar events for a batch of meetings in one request,
+        then mark the Notion entries as scheduled concurrently.
+        Idempotent: pages that already have an event are not inserted again, new events
+        get deterministic IDs, and the page -> event mapping is saved before Notion is updated.
+        Entries whose content hash matches their mapping are skipped before any Google call;
+        edited ones update their existing event.
+        Returns counts of "scheduled", "failed" and "skipped" meetings.
+        """
+        try:
+            mappings = await self.get_event_mappings(user_id, [meeting["key"] for meeting in meetings])
+        except Exception as e:
+            await self.log_error(user_id, "action", "system", f"Failed to load event mappings for {len(meetings)} meetings", str(e))
+            return {"scheduled": 0, "failed": len(meetings), "skipped": 0}
+        
+        event_ids = {}
+        to_create = []
+        to_update = []
+        to_mark = []
+        skipped = 0
+        failed_updates = 0
+        for meeting in meetings:
+            mapping = mappings.get(meeting["key"])
+            deterministic_id = make_event_id(f"{user_id}:{meeting['key']}")
+            if mapping:
+                # Our own event for this page: update it only if the content changed
+                event_ids[meeting["key"]] = mapping["google_event_id"]
+                if mapping.get("content_hash") != meeting["content_hash"]:
+                    to_update.append(meeting)
+                    continue
+            elif meeting.get("notion_event_id") == deterministic_id:
+                # Created by us for this very page, but its mapping write failed; the stored
+                # hash is unknown, so bring the event in line and record the mapping
+                event_ids[meeting["key"]] = deterministic_id
+                to_update.append(meeting)
+                continue
+            else:
+                # Never created, or an Event ID copied from another page (duplicated page):
+                # create this page's own event rather than touching another page's
+                meeting["event_id"] = deterministic_id
+                to_create.append(meeting)
+                continue
+            
+            existing_event_id = event_ids[meeting["key"]]
+            if self.needs_notion_update(meeting, existing_event_id):
+                # Unchanged, but Notion was never marked: only retry the Notion update
+                to_mark.append(meeting)
+            else:
+                # Unchanged and already marked (e.g. re-read by the fallback query): no API calls at all
+                skipped += 1
+        
+        if to_update:
+            updated = await asyncio.gather(*(
+                self.update_meeting_event(user_id, meeting, event_ids[meeting["key"]], google_service, google_slots)
+                for meeting in to_update
+            ))
+            for meeting, status in zip(to_update, updated):
+                if status is False:
+                    # Retried on the next poll: the stored hash still differs
+                    failed_updates += 1
+                    await self.publish_progress(user_id, "entry_failed", entry_id=meeting["key"], title=meeting["summary"], error="Event update failed")
+                elif status is None:
+                    # Deleted in Google Calendar: respect that and stop syncing the entry
+                    skipped += 1
+                else:
+                    to_mark.append(meeting)
+            await self.save_event_mappings(user_id, [
+                {
+                    "notion_page_id": meeting["key"],
+                    "google_event_id": event_ids[meeting["key"]],
+                    "content_hash": meeting["content_hash"]
+                }
+                for meeting, status in zip(to_update, updated) if status is not False
+            ])
+        
+        for meeting in to_create:
+            print(f"Scheduling: {meeting['summary']} for {meeting['attendees']}")
+        
+        if to_create:
+            try:
+                async with google_slots:
+                    created = await google_service.create_events_batch(to_create)
+            except Exception as e:
+                await self.log_error(user_id, "action", "google", f"Failed to create batch of {len(to_create)} Google Calendar events", str(e))
+                created = {}
+            event_ids.update({key: event_id for key, event_id in created.items() if event_id})
+            
+            # Record new events before touching Notion; deterministic IDs cover a failed write
+            await self.save_event_mappings(user_id, [
+                {
+                    "notion_page_id": meeting["key"],
+                    "google_event_id": event_ids[meeting["key"]],
+                    "content_hash": meeting["content_hash"]
+                }
+                for meeting in to_create if meeting["key"] in event_ids
+            ])
+        
+        statuses = await asyncio.gather(*(
+            self.mark_scheduled(user_id, meeting, event_ids.get(meeting["key"]), notion_service, notion_slots)
+            for meeting in to_create + to_mark
+        ))
+        return {
+            "scheduled": statuses.count("scheduled"),
+            "failed": statuses.count("failed") + failed_updates,
+            "skipped": skipped
+        }
+    
+    def needs_notion_update(self, meeting: Dict[str, Any], event_id: str) -> bool:
+        return meeting["mark_done"] or (meeting["has_event_id_property"] and meeting.get("notion_event_id") != event_id)
+    
+    async def update_meeting_event(self, user_id: str, meeting: Dict[str, Any], event_id: str,
+                                   google_service: GoogleService, google_slots: asyncio.Semaphore) -> Optional[bool]:
+        """
+        Apply an edited entry to its existing event (True updated, False failed, None event deleted).
+        """
+        print(f"Updating: {meeting['summary']} for {meeting['attendees']}")
+        try:
+            async with google_slots:
+                updated = await google_service.update_event(
+                    event_id, meeting["summary"], meeting["start_time"], meeting["end_time"], meeting["attendees"]
+                )
+            if updated is False:
+                await self.log_error(user_id, "action", "google", f"Failed to update Google Calendar event for: {meeting['summary']}", "Event update failed")
+            return updated
+        except Exception as e:
+            await self.log_error(user_id, "action", "google", f"Failed to update Google Calendar event for: {meeting['summary']}", str(e))
+            return False
+    
+    async def mark_scheduled(self, user_id: str, meeting: Dict[str, Any], event_id: Optional[str],
+                             notion_service: NotionService, notion_slots: asyncio.Semaphore) -> str:
+        """
+        Update the Notion entry of a created event.
+        Returns "scheduled" or "failed".
+        """
+        title = meeting["summary"]
+        try:
+            if not event_id:
+                await self.log_error(user_id, "action", "google", f"Failed to create Google Calendar event for: {title}", "Event creation failed")
+                await self.publish_progress(user_id, "entry_failed", entry_id=meeting["key"], title=title, error="Event creation failed")
+                return "failed"
+            
+            # Update Notion with event ID
+            async with notion_slots:
+                success = await notion_service.update_entry_with_event_id(
+                    meeting["key"],
+                    event_id,
+                    mark_done=meeting["mark_done"],
+                    write_event_id=meeting["has_event_id_property"] and meeting.get("notion_event_id") != event_id
+                )
+            if success:
+                print(f"✅ Scheduled meeting: {title}")
+                await self.publish_progress(user_id, "entry_scheduled", entry_id=meeting["key"], title=title, event_id=event_id)
+                return "scheduled"
+            await self.log_error(user_id, "action", "notion", f"Failed to update Notion for meeting: {title}", "Update failed")
+            error = "Update failed"
+        except Exception as e:
+            await self.log_error(user_id, "action", "system", f"Failed to process meeting entry {meeting['key']}", str(e))
+            error = str(e)
+        await self.publish_progress(user_id, "entry_failed", entry_id=meeting["key"], title=title, error=error)
+        return "failed"
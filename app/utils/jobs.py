@@ -0,0 +1,38 @@
+import asyncio
+from typing import Any, Dict, Optional
+from celery.result import AsyncResult
+from app.celery import celery_app
+from app.config import settings
+from app.redis_client import get_redis
+
+def _owner_key(job_id: str) -> str:
+    return f"job-owner:{job_id}"
+
+async def record_job_owner(job_id: str, user_id: str):
+    """
+    Remember which user started a job, for as long as Celery keeps its result.
+    """
+    await get_redis().set(_owner_key(job_id), user_id, ex=settings.JOB_RESULT_EXPIRES)
+
+async def get_job_owner(job_id: str) -> Optional[str]:
+    return await get_redis().get(_owner_key(job_id))
+
+def _read_job_status(job_id: str) -> Dict[str, Any]:
+    result = AsyncResult(job_id, app=celery_app)
+    state = result.state
+    status = {"job_id": job_id, "status": state}
+    
+    if state == "PROGRESS":
+        status["progress"] = result.info
+    elif state == "SUCCESS":
+        status["result"] = result.result
+    elif state in ("FAILURE", "REVOKED"):
+        status["error"] = str(result.result)
+    return status
+
+async def get_job_status(job_id: str) -> Dict[str, Any]:
+    """
+    Read a job's state from the Celery result backend (PENDING, STARTED, PROGRESS, SUCCESS, FAILURE).
+    """
+    # The result backend client is blocking; keep it off the event loop
+    return await asyncio.to_thread(_read_job_status, job_id)
@@ -0,0 +1,69 @@
+import asyncio
+import gzip
+import json
+import os
+from typing import Any, Dict, List
+from app.config import settings
+from app.repository import admin_repository
+
+ARCHIVE_PAGE_SIZE = 1000
+
+def _write_archive(path: str, records: List[Dict[str, Any]], append: bool):
+    with gzip.open(path, "at" if append else "wt", encoding="utf-8") as handle:
+        for record in records:
+            handle.write(json.dumps(record, default=str) + "\n")
+
+async def archive_partition(partition: Dict[str, Any]) -> int:
+    """
+    Export one monthly partition to a gzip-compressed JSONL file in LOG_ARCHIVE_DIR.
+    Returns the number of archived rows.
+    """
+    os.makedirs(settings.LOG_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(settings.LOG_ARCHIVE_DIR, f"{partition['partition_name']}.jsonl.gz")
+    partial_path = f"{path}.partial"
+    
+    archived = 0
+    after = None
+    while True:
+        records = await admin_repository.get_logs_between(
+            partition["range_start"], partition["range_end"], ARCHIVE_PAGE_SIZE, after=after
+        )
+        if records:
+            await asyncio.to_thread(_write_archive, partial_path, records, archived > 0)
+            archived += len(records)
+            after = (records[-1]["created_at"], records[-1]["id"])
+        if len(records) < ARCHIVE_PAGE_SIZE:
+            break
+    
+    # Only a complete export is published under the final name
+    if archived:
+        os.replace(partial_path, path)
+    return archived
+
+async def maintain_log_partitions() -> Dict[str, Any]:
+    """
+    Create upcoming monthly partitions of workflow_execution_logs, then archive
+    (if LOG_ARCHIVE_ENABLED) and drop partitions older than LOG_RETENTION_MONTHS.
+    Rollups are kept, so analytics still cover dropped months.
+    """
+    created = await admin_repository.ensure_log_partitions(settings.LOG_PARTITIONS_AHEAD)
+    
+    dropped = []
+    archived_rows = 0
+    for partition in await admin_repository.list_expired_log_partitions(settings.LOG_RETENTION_MONTHS):
+        name = partition["partition_name"]
+        try:
+            if settings.LOG_ARCHIVE_ENABLED:
+                archived_rows += await archive_partition(partition)
+            await admin_repository.drop_log_partition(name)
+            dropped.append(name)
+            print(f"🗄️ Archived and dropped log partition {name}")
+        except Exception as e:
+            # Keep the partition; the next run retries it
+            print(f"❌ Failed to archive log partition {name}: {str(e)}")
+    
+    return {
+        "partitions_created": created,
+        "partitions_dropped": dropped,
+        "rows_archived": archived_rows
+    }
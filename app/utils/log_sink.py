@@ -0,0 +1,188 @@
+import asyncio
+import time
+from typing import Any, Dict, List
+from app.config import settings
+from app.repository import repository
+from app.utils.log_spool import LogSpool
+from app.utils.loop_local import LoopLocal
+
+# Shared by every sink in this process
+spool = LogSpool(settings.LOG_SPOOL_PATH)
+
+class LogSink:
+    """
+    Buffered writer for workflow_execution_logs.
+    Records are queued in memory and written with bulk multi-row inserts when
+    LOG_BATCH_SIZE records are waiting, every LOG_FLUSH_INTERVAL seconds, or on flush().
+    The queue is bounded: when full, LOG_OVERFLOW_POLICY "block" applies
+    backpressure (up to LOG_BLOCK_TIMEOUT), "drop" discards the record and
+    "spill" appends it to the local spool file.
+    Failed inserts are spilled to the spool as well, and replayed into
+    Supabase every LOG_SPOOL_REPLAY_INTERVAL seconds once it is reachable.
+    """
+    
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.LOG_QUEUE_MAXSIZE)
+        self.dropped = 0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher = None
+        self._last_replay = 0.0
+    
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+    
+    async def emit(self, record: Dict[str, Any]):
+        """
+        Queue one log record.
+        """
+        self._ensure_flusher()
+        try:
+            if settings.LOG_OVERFLOW_POLICY == "block":
+                await asyncio.wait_for(self.queue.put(record), timeout=settings.LOG_BLOCK_TIMEOUT)
+            else:
+                self.queue.put_nowait(record)
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            self.on_overflow(record)
+            return
+        
+        if self.queue.qsize() >= settings.LOG_BATCH_SIZE:
+            self._wakeup.set()
+    
+    def on_overflow(self, record: Dict[str, Any]):
+        if settings.LOG_OVERFLOW_POLICY == "spill":
+            self.spill([record])
+            return
+        self.dropped += 1
+        print(f"❌ Log queue full, dropped log record ({self.dropped} dropped so far): {record.get('description')}")
+    
+    def _drain(self) -> List[Dict[str, Any]]:
+        records = []
+        while not self.queue.empty():
+            records.append(self.queue.get_nowait())
+        return records
+    
+    async def flush(self):
+        """
+        Write every queued record now, in bulk inserts of LOG_BATCH_SIZE rows.
+        """
+        async with self._flush_lock:
+            records = self._drain()
+            for i in range(0, len(records), settings.LOG_BATCH_SIZE):
+                await self.write(records[i:i + settings.LOG_BATCH_SIZE])
+    
+    def request_flush(self):
+        """
+        Ask the background flusher to write soon, without waiting for it.
+        """
+        self._ensure_flusher()
+        self._wakeup.set()
+    
+    async def write(self, records: List[Dict[str, Any]]) -> bool:
+        try:
+            await asyncio.wait_for(repository.insert_logs(records), timeout=settings.LOG_WRITE_TIMEOUT)
+            return True
+        except Exception as e:
+            print(f"❌ Failed to write {len(records)} log records, spooling locally: {str(e)}")
+            self.spill(records)
+            return False
+    
+    def spill(self, records: List[Dict[str, Any]]):
+        try:
+            spool.append(records)
+        except Exception as e:
+            self.dropped += len(records)
+            print(f"❌ Failed to spool {len(records)} log records: {str(e)}")
+    
+    async def replay(self):
+        """
+        Bulk-load spooled records into Supabase; stop (and re-spool) at the first failure.
+        """
+        if not spool.has_records():
+            return
+        claimed_files = await asyncio.to_thread(spool.claim)
+        try:
+            while claimed_files:
+                claimed = claimed_files[0]
+                records = await asyncio.to_thread(spool.read, claimed)
+                for i in range(0, len(records), settings.LOG_BATCH_SIZE):
+                    chunk = records[i:i + settings.LOG_BATCH_SIZE]
+                    try:
+                        # A replay that died midway may have stored some rows already; skip them
+                        await asyncio.wait_for(repository.insert_logs(chunk, ignore_duplicates=True), timeout=settings.LOG_WRITE_TIMEOUT)
+                    except Exception as e:
+                        print(f"❌ Log replay failed, keeping {len(records) - i} records spooled: {str(e)}")
+                        self.spill(records[i:])
+                        await asyncio.to_thread(spool.discard, claimed_files.pop(0))
+                        return
+                await asyncio.to_thread(spool.discard, claimed_files.pop(0))
+                print(f"✅ Replayed {len(records)} spooled log records")
+        finally:
+            # Unreplayed files are unlocked for the next replay (also on cancellation)
+            for claimed in claimed_files:
+                spool.release(claimed)
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.LOG_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            
+            if time.monotonic() - self._last_replay >= settings.LOG_SPOOL_REPLAY_INTERVAL:
+                self._last_replay = time.monotonic()
+                try:
+                    await self.replay()
+                except Exception as e:
+                    print(f"❌ Log replay error: {str(e)}")
+    
+    async def close(self):
+        """
+        Stop the background flusher and write whatever is still queued.
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+async def _close_sink(sink: LogSink):
+    await sink.close()
+
+_sinks = LoopLocal(LogSink, _close_sink)
+
+def get_log_sink() -> LogSink:
+    """
+    Get the log sink of the running event loop.
+    """
+    return _sinks.get()
+
+async def flush_logs():
+    """
+    Write all buffered log records now and wait for the write.
+    """
+    await get_log_sink().flush()
+
+def request_log_flush():
+    """
+    Schedule a background write of buffered records (e.g. at the end of a task),
+    so log persistence never adds latency to the caller.
+    """
+    get_log_sink().request_flush()
+
+async def close_log_sink():
+    """
+    Flush and stop the running event loop's log sink (call on shutdown).
+    """
+    await _sinks.close()
+
+def reset_log_sinks():
+    """
+    Forget sinks inherited from a parent process (after a worker fork).
+    """
+    _sinks.reset()
@@ -0,0 +1,147 @@
+import glob
+import json
+import os
+import threading
+import uuid
+from typing import IO, Any, Dict, List, Optional
+
+try:
+    import fcntl  # Cross-process file locking (not available on Windows)
+except ImportError:
+    fcntl = None
+
+def _owner_pid(path: str) -> Optional[int]:
+    """PID embedded in a replay file name (<spool>.replaying-<pid>-<uuid>)"""
+    try:
+        return int(path.rsplit(".replaying-", 1)[1].split("-", 1)[0])
+    except (IndexError, ValueError):
+        return None
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+class ClaimedSpoolFile:
+    """
+    A replay file owned by this process; its open handle holds the lock.
+    """
+    
+    def __init__(self, path: str, handle: IO[str]):
+        self.path = path
+        self.handle = handle
+
+class LogSpool:
+    """
+    Append-only JSONL spool for log records that could not be written to Supabase.
+    Appends are local and fast; a replayer later claims the file by renaming it
+    and bulk-loads the records into workflow_execution_logs.
+    Several worker processes may share one spool path.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def _lock_file(self, handle):
+        if fcntl:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+    
+    def append(self, records: List[Dict[str, Any]]):
+        """
+        Append records to the spool, one JSON object per line.
+        """
+        if not records:
+            return
+        data = "".join(json.dumps(record, default=str) + "\n" for record in records)
+        with self._lock:
+            while True:
+                with open(self.path, "a", encoding="utf-8") as handle:
+                    self._lock_file(handle)
+                    # The file may have been claimed (renamed) while we waited for the lock
+                    if os.path.exists(self.path) and os.fstat(handle.fileno()).st_ino == os.stat(self.path).st_ino:
+                        handle.write(data)
+                        handle.flush()
+                        return
+    
+    def has_records(self) -> bool:
+        return (os.path.exists(self.path) and os.path.getsize(self.path) > 0) or bool(glob.glob(f"{self.path}.replaying-*"))
+    
+    def _try_own(self, path: str) -> Optional[ClaimedSpoolFile]:
+        """
+        Open a replay file and take its lock without waiting. A file still locked
+        (or, without fcntl, named after a live process) belongs to a running replay.
+        """
+        if not fcntl:
+            pid = _owner_pid(path)
+            if pid is not None and pid != os.getpid() and _pid_alive(pid):
+                return None
+        try:
+            handle = open(path, "a+", encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        try:
+            if fcntl:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # It may have been discarded or renamed between open and lock
+            if os.fstat(handle.fileno()).st_ino != os.stat(path).st_ino:
+                raise FileNotFoundError(path)
+        except (BlockingIOError, FileNotFoundError):
+            handle.close()
+            return None
+        return ClaimedSpoolFile(path, handle)
+    
+    def claim(self) -> List[ClaimedSpoolFile]:
+        """
+        Take ownership of the spool (and of files abandoned by a replay that died).
+        Claimed files stay locked until released, so concurrent replays in this or
+        other processes skip them. Returns the claimed files.
+        """
+        claimed = []
+        if os.path.exists(self.path):
+            target = f"{self.path}.replaying-{os.getpid()}-{uuid.uuid4().hex}"
+            try:
+                with open(self.path, "a", encoding="utf-8") as handle:
+                    self._lock_file(handle)
+                    os.replace(self.path, target)
+            except FileNotFoundError:
+                pass
+        
+        for candidate in glob.glob(f"{self.path}.replaying-*"):
+            owned = self._try_own(candidate)
+            if owned:
+                claimed.append(owned)
+        return claimed
+    
+    def read(self, claimed: ClaimedSpoolFile) -> List[Dict[str, Any]]:
+        records = []
+        claimed.handle.seek(0)
+        for line in claimed.handle:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                print(f"❌ Skipping corrupt spooled log line in {claimed.path}")
+        return records
+    
+    def discard(self, claimed: ClaimedSpoolFile):
+        """
+        Delete a replayed file while still holding its lock, then release it.
+        """
+        try:
+            os.remove(claimed.path)
+        except FileNotFoundError:
+            pass
+        self.release(claimed)
+    
+    def release(self, claimed: ClaimedSpoolFile):
+        """
+        Give up a claimed file (closing it drops the lock); a later replay adopts it.
+        """
+        claimed.handle.close()
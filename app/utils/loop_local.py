@@ -0,0 +1,43 @@
+import asyncio
+import weakref
+from typing import Any, Awaitable, Callable, Optional
+
+
+class LoopLocal:
+    """
+    Holds one instance of a loop-bound resource per running event loop.
+    Async clients (httpx, redis, postgrest) can only be used on the loop that
+    created them, so process-wide registries are keyed by the current loop.
+    """
+
+    def __init__(self, factory: Callable[[], Any], closer: Optional[Callable[[Any], Awaitable[None]]] = None):
+        self.factory = factory
+        self.closer = closer
+        self._instances: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+    def get(self) -> Any:
+        """
+        Get (or lazily create) the instance for the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        instance = self._instances.get(loop)
+        if instance is None:
+            instance = self.factory()
+            self._instances[loop] = instance
+        return instance
+
+    async def close(self):
+        """
+        Close and forget the instance bound to the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        instance = self._instances.pop(loop, None)
+        if instance is not None and self.closer:
+            await self.closer(instance)
+
+    def reset(self):
+        """
+        Forget every instance without closing it.
+        Used after a fork, where inherited sockets belong to the parent process.
+        """
+        self._instances = weakref.WeakKeyDictionary()
@@ -0,0 +1,54 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional
+from app.config import settings
+from app.redis_client import get_redis
+
+def progress_channel(user_id: str) -> str:
+    return f"workflow-progress:{user_id}"
+
+async def publish_progress(user_id: str, event: str, **data: Any):
+    """
+    Publish a workflow progress event to the user's Redis channel.
+    Best effort: progress events must never fail or slow down a workflow run.
+    """
+    if not settings.PROGRESS_EVENTS_ENABLED or user_id == "system":
+        return
+    message = {
+        "event": event,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        **data
+    }
+    try:
+        await asyncio.wait_for(
+            get_redis().publish(progress_channel(user_id), json.dumps(message, default=str)),
+            timeout=settings.PROGRESS_PUBLISH_TIMEOUT
+        )
+    except Exception as e:
+        print(f"Warning: Failed to publish progress event for user {user_id}: {str(e)}")
+
+async def subscribe_progress(user_id: str, heartbeat_interval: float = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Yield the user's progress events as they are published.
+    Yields None when nothing arrived within heartbeat_interval, so callers can send keep-alives.
+    """
+    heartbeat_interval = heartbeat_interval or settings.PROGRESS_HEARTBEAT_INTERVAL
+    pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(progress_channel(user_id))
+    try:
+        while True:
+            message = await pubsub.get_message(timeout=heartbeat_interval)
+            if message is None:
+                yield None
+                continue
+            try:
+                yield json.loads(message["data"])
+            except (TypeError, ValueError):
+                continue
+    finally:
+        try:
+            await pubsub.unsubscribe()
+            await pubsub.close()
+        except Exception as e:
+            print(f"Warning: Failed to close progress subscription: {str(e)}")
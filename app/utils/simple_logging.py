@@ -1,10 +1,11 @@
 import uuid
 from datetime import datetime
-from app.database import supabase
+from app.utils.log_sink import get_log_sink
 
-def log_execution(user_id, workflow_id, step_id, step_type, app, description, success=True, error=None):
+async def log_execution(user_id, workflow_id, step_id, step_type, app, description, success=True, error=None):
     """
-    Simple logging function for workflow executions
+    Simple logging function for workflow executions.
+    Records are buffered and written in bulk by the log sink.
     
     Args:
         user_id: User identifier
@@ -17,7 +18,7 @@ def log_execution(user_id, workflow_id, step_id, step_type, app, description, su
         error: Error message if failed
     """
     try:
-        supabase.table("workflow_execution_logs").insert({
+        await get_log_sink().emit({
             "id": str(uuid.uuid4()),
             "user_id": user_id,
             "workflow_id": workflow_id,
@@ -28,16 +29,17 @@ def log_execution(user_id, workflow_id, step_id, step_type, app, description, su
             "success": success,
             "error": error,
             "created_at": datetime.now().isoformat()
-        }).execute()
+        })
         
         print(f"✅ Logged: {description} ({'Success' if success else 'Failed'})")
         
     except Exception as e:
         print(f"❌ Failed to log execution: {str(e)}")
 
-def log_workflow_execution(user_id, workflow_id, workflow_name, description, items_processed=0, items_created=0, success=True, error=None):
+async def log_workflow_execution(user_id, workflow_id, workflow_name, description, items_processed=0, items_created=0, success=True, error=None):
     """
-    Log a complete workflow execution summary (workflow-agnostic)
+    Log a complete workflow execution summary (workflow-agnostic).
+    Records are buffered and written in bulk by the log sink.
     
     Args:
         user_id: User identifier
@@ -50,7 +52,7 @@ def log_workflow_execution(user_id, workflow_id, workflow_name, description, ite
         error: Error message if failed
     """
     try:
-        supabase.table("workflow_execution_logs").insert({
+        await get_log_sink().emit({
             "id": str(uuid.uuid4()),
             "user_id": user_id,
             "workflow_id": workflow_id,
@@ -61,13 +63,13 @@ def log_workflow_execution(user_id, workflow_id, workflow_name, description, ite
             "success": success,
             "error": error,
             "created_at": datetime.now().isoformat()
-        }).execute()
+        })
         
         print(f"✅ Workflow Execution: [{workflow_name}] {description} ({'Success' if success else 'Failed'})")
         
     except Exception as e:
         print(f"❌ Failed to log workflow execution: {str(e)}")
 
-def log_error(user_id, workflow_id, step_type, app, description, error):
+async def log_error(user_id, workflow_id, step_type, app, description, error):
     """Log an error"""
-    log_execution(user_id, workflow_id, None, step_type, app, description, False, error) 
\ No newline at end of file
+    await log_execution(user_id, workflow_id, None, step_type, app, description, False, error) 
\ No newline at end of file
@@ -0,0 +1,128 @@
+import os
+import asyncio
+import concurrent.futures
+import threading
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
+from app.config import settings
+from app.database import init_clients
+from app.repository import repository, admin_repository
+from app.redis_client import close_redis, reset_redis
+from app.utils.log_sink import close_log_sink, reset_log_sinks
+from app.services.http_client import close_http_client, reset_http_clients
+
+class WorkerLoop:
+    """
+    One long-lived asyncio event loop per worker process, running in a background thread.
+    Task bodies are submitted to it instead of calling asyncio.run() per task,
+    so loop-bound resources such as the HTTP pool survive across tasks.
+    """
+    
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """
+        Start the loop thread for this process (no-op if already running).
+        """
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="worker-event-loop", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+    
+    def run(self, coro, timeout: float = None):
+        """
+        Run a coroutine on the worker loop and block until it returns.
+        After timeout seconds the coroutine is cancelled on the loop and TimeoutError is raised,
+        so a hung task body never holds the worker slot (or the shared loop) forever.
+        """
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Task body timed out after {timeout:.0f}s")
+    
+    def stop(self):
+        """
+        Close loop-bound resources and stop the loop thread.
+        """
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                return
+            loop, thread = self._loop, self._thread
+            self._loop = None
+        
+        for close in (close_log_sink, close_http_client, repository.close, admin_repository.close, close_redis):
+            try:
+                asyncio.run_coroutine_threadsafe(close(), loop).result(timeout=10)
+            except Exception as e:
+                print(f"Failed to close worker connections: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=10)
+        loop.close()
+
+worker_loop = WorkerLoop()
+
+def run_async(coro, timeout: float = None):
+    """
+    Run an async task body on this process's persistent event loop,
+    giving up after timeout seconds (WORKER_TASK_TIMEOUT by default).
+    """
+    return worker_loop.run(coro, timeout=timeout or settings.WORKER_TASK_TIMEOUT)
+
+# Default concurrency per pool type when CELERY_WORKER_CONCURRENCY is not set
+DEFAULT_CONCURRENCY = {
+    "solo": lambda cpus: 1,
+    "prefork": lambda cpus: cpus,
+    "threads": lambda cpus: cpus * 4,
+}
+
+def resolve_worker_profile() -> dict:
+    """
+    Resolve the Celery pool type and concurrency from environment settings.
+    """
+    pool = settings.CELERY_WORKER_POOL
+    if pool not in DEFAULT_CONCURRENCY:
+        raise ValueError(f"Unsupported worker pool: {pool}")
+    
+    concurrency = settings.CELERY_WORKER_CONCURRENCY or DEFAULT_CONCURRENCY[pool](os.cpu_count() or 1)
+    return {"worker_pool": pool, "worker_concurrency": concurrency}
+
+@worker_init.connect
+def check_worker_profile(**kwargs):
+    """
+    Warn when the solo pool leaves the cores of a multi-core host idle.
+    """
+    cpus = os.cpu_count() or 1
+    profile = resolve_worker_profile()
+    print(f"Celery worker profile: pool={profile['worker_pool']}, concurrency={profile['worker_concurrency']}, cpus={cpus}")
+    if profile["worker_pool"] == "solo" and cpus > 1:
+        print(f"⚠️ Solo pool uses 1 of {cpus} cores; set CELERY_WORKER_POOL=prefork (or threads) in production")
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """
+    Initialize per-child clients once after a prefork worker child starts.
+    """
+    reset_http_clients()
+    repository.reset()
+    admin_repository.reset()
+    reset_redis()
+    reset_log_sinks()
+    init_clients()
+    worker_loop.start()
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def shutdown_worker_loop(**kwargs):
+    """
+    Close pooled connections and stop the event loop when the worker exits.
+    """
+    worker_loop.stop()
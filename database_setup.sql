@@ -29,6 +29,9 @@ CREATE TABLE IF NOT EXISTS user_integrations (
     UNIQUE(user_id, provider)
 );
 
+-- Set when a refresh token is permanently rejected (revoked/invalid_grant); cleared by reconnecting
+ALTER TABLE user_integrations ADD COLUMN IF NOT EXISTS needs_reconnect BOOLEAN NOT NULL DEFAULT FALSE;
+
 -- 4. User Workflows table
 CREATE TABLE IF NOT EXISTS user_workflows (
     id SERIAL PRIMARY KEY,
@@ -39,9 +42,18 @@ CREATE TABLE IF NOT EXISTS user_workflows (
     UNIQUE(user_id, workflow_id)
 );
 
--- 5. Workflow Execution Logs table
+-- 5. Workflow Execution Logs table (partitioned by month on created_at)
+-- An existing unpartitioned table is moved aside here and copied back below
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'workflow_execution_logs' AND relkind = 'r') THEN
+        ALTER TABLE workflow_execution_logs RENAME TO workflow_execution_logs_legacy;
+        ALTER TABLE workflow_execution_logs_legacy RENAME CONSTRAINT workflow_execution_logs_pkey TO workflow_execution_logs_legacy_pkey;
+    END IF;
+END $$;
+
 CREATE TABLE IF NOT EXISTS workflow_execution_logs (
-    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
     user_id TEXT NOT NULL,
     workflow_id INT NOT NULL,
     step_id INT,
@@ -50,7 +62,216 @@ CREATE TABLE IF NOT EXISTS workflow_execution_logs (
     description TEXT,
     success BOOLEAN,
     error TEXT,
-    created_at TIMESTAMP DEFAULT NOW()
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)  -- The partition key must be part of the primary key
+) PARTITION BY RANGE (created_at);
+
+-- Rows outside every monthly partition land here
+CREATE TABLE IF NOT EXISTS workflow_execution_logs_default PARTITION OF workflow_execution_logs DEFAULT;
+
+-- Create monthly partitions from months_back months ago to months_ahead months ahead
+CREATE OR REPLACE FUNCTION ensure_workflow_log_partitions(months_ahead INT DEFAULT 2, months_back INT DEFAULT 0)
+RETURNS INT AS $$
+DECLARE
+    month_start DATE;
+    partition_name TEXT;
+    created INT := 0;
+BEGIN
+    FOR i IN -months_back..months_ahead LOOP
+        month_start := (date_trunc('month', NOW()) + make_interval(months => i))::DATE;
+        partition_name := format('workflow_execution_logs_%s', to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF workflow_execution_logs FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, (month_start + INTERVAL '1 month')::DATE
+            );
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Monthly partitions that are entirely older than the retention period
+CREATE OR REPLACE FUNCTION list_expired_workflow_log_partitions(retention_months INT)
+RETURNS TABLE (partition_name TEXT, range_start DATE, range_end DATE) AS $$
+    SELECT
+        c.relname::TEXT,
+        to_date(right(c.relname, 7), 'YYYY_MM'),
+        (to_date(right(c.relname, 7), 'YYYY_MM') + INTERVAL '1 month')::DATE
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'workflow_execution_logs'::REGCLASS
+      AND c.relname ~ '^workflow_execution_logs_[0-9]{4}_[0-9]{2}$'
+      AND to_date(right(c.relname, 7), 'YYYY_MM') + INTERVAL '1 month'
+          <= date_trunc('month', NOW()) - make_interval(months => retention_months)
+    ORDER BY 2;
+$$ LANGUAGE sql;
+
+-- Drop one monthly partition (after it has been archived)
+CREATE OR REPLACE FUNCTION drop_workflow_log_partition(p_partition_name TEXT)
+RETURNS VOID AS $$
+BEGIN
+    IF p_partition_name !~ '^workflow_execution_logs_[0-9]{4}_[0-9]{2}$' THEN
+        RAISE EXCEPTION 'Not a workflow log partition: %', p_partition_name;
+    END IF;
+    EXECUTE format('DROP TABLE IF EXISTS %I', p_partition_name);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partition maintenance is for the service role only
+REVOKE EXECUTE ON FUNCTION ensure_workflow_log_partitions(INT, INT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION list_expired_workflow_log_partitions(INT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION drop_workflow_log_partition(TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION ensure_workflow_log_partitions(INT, INT) TO service_role;
+GRANT EXECUTE ON FUNCTION list_expired_workflow_log_partitions(INT) TO service_role;
+GRANT EXECUTE ON FUNCTION drop_workflow_log_partition(TEXT) TO service_role;
+
+SELECT ensure_workflow_log_partitions(2, 0);
+
+-- Copy rows from a pre-partitioning table, creating the partitions they need
+DO $$
+DECLARE
+    oldest TIMESTAMP;
+BEGIN
+    IF to_regclass('workflow_execution_logs_legacy') IS NOT NULL THEN
+        SELECT MIN(created_at) INTO oldest FROM workflow_execution_logs_legacy;
+        IF oldest IS NOT NULL THEN
+            PERFORM ensure_workflow_log_partitions(
+                2,
+                ((EXTRACT(YEAR FROM age(date_trunc('month', NOW()), date_trunc('month', oldest))) * 12)
+                 + EXTRACT(MONTH FROM age(date_trunc('month', NOW()), date_trunc('month', oldest))))::INT
+            );
+        END IF;
+        INSERT INTO workflow_execution_logs (id, user_id, workflow_id, step_id, step_type, app, description, success, error, created_at)
+        SELECT id, user_id, workflow_id, step_id, step_type, app, description, success, error, COALESCE(created_at, NOW())
+        FROM workflow_execution_logs_legacy;
+        DROP TABLE workflow_execution_logs_legacy;
+    END IF;
+END $$;
+
+-- 6. Notion sync state (per-user, per-database polling watermarks)
+CREATE TABLE IF NOT EXISTS notion_sync_state (
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    database_id TEXT NOT NULL,
+    last_edited_watermark TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (user_id, database_id)
+);
+
+-- Advance a watermark atomically; it never moves backwards
+CREATE OR REPLACE FUNCTION advance_notion_watermark(p_user_id UUID, p_database_id TEXT, p_watermark TIMESTAMPTZ)
+RETURNS TIMESTAMPTZ AS $$
+    INSERT INTO notion_sync_state (user_id, database_id, last_edited_watermark, updated_at)
+    VALUES (p_user_id, p_database_id, p_watermark, NOW())
+    ON CONFLICT (user_id, database_id) DO UPDATE SET
+        last_edited_watermark = GREATEST(notion_sync_state.last_edited_watermark, EXCLUDED.last_edited_watermark),
+        updated_at = NOW()
+    RETURNING last_edited_watermark;
+$$ LANGUAGE sql;
+
+-- 7. Workflow execution rollups (per user, per workflow, per day)
+-- Maintained by a trigger on workflow_execution_logs so analytics never scan the raw logs
+CREATE TABLE IF NOT EXISTS workflow_execution_rollups (
+    user_id TEXT NOT NULL,
+    workflow_id INT NOT NULL,
+    day DATE NOT NULL,
+    actions INT NOT NULL DEFAULT 0,             -- every log row
+    successful_actions INT NOT NULL DEFAULT 0,
+    executions INT NOT NULL DEFAULT 0,          -- workflow execution summaries only
+    successes INT NOT NULL DEFAULT 0,
+    failures INT NOT NULL DEFAULT 0,
+    last_execution TIMESTAMP,
+    PRIMARY KEY (user_id, workflow_id, day)
+);
+
+CREATE OR REPLACE FUNCTION rollup_workflow_execution_log()
+RETURNS TRIGGER AS $$
+DECLARE
+    is_execution BOOLEAN := COALESCE(NEW.step_type = 'execution' AND NEW.app = 'workflow', FALSE);
+    succeeded BOOLEAN := COALESCE(NEW.success, FALSE);
+BEGIN
+    INSERT INTO workflow_execution_rollups AS r
+        (user_id, workflow_id, day, actions, successful_actions, executions, successes, failures, last_execution)
+    VALUES (
+        NEW.user_id,
+        NEW.workflow_id,
+        COALESCE(NEW.created_at, NOW())::DATE,
+        1,
+        CASE WHEN succeeded THEN 1 ELSE 0 END,
+        CASE WHEN is_execution THEN 1 ELSE 0 END,
+        CASE WHEN is_execution AND succeeded THEN 1 ELSE 0 END,
+        CASE WHEN is_execution AND NOT succeeded THEN 1 ELSE 0 END,
+        CASE WHEN is_execution THEN NEW.created_at END
+    )
+    ON CONFLICT (user_id, workflow_id, day) DO UPDATE SET
+        actions = r.actions + EXCLUDED.actions,
+        successful_actions = r.successful_actions + EXCLUDED.successful_actions,
+        executions = r.executions + EXCLUDED.executions,
+        successes = r.successes + EXCLUDED.successes,
+        failures = r.failures + EXCLUDED.failures,
+        last_execution = GREATEST(r.last_execution, EXCLUDED.last_execution);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_rollup_workflow_execution_log ON workflow_execution_logs;
+CREATE TRIGGER trg_rollup_workflow_execution_log
+    AFTER INSERT ON workflow_execution_logs
+    FOR EACH ROW EXECUTE FUNCTION rollup_workflow_execution_log();
+
+-- Backfill rollups from existing logs (first run only)
+INSERT INTO workflow_execution_rollups
+    (user_id, workflow_id, day, actions, successful_actions, executions, successes, failures, last_execution)
+SELECT
+    user_id,
+    workflow_id,
+    COALESCE(created_at, NOW())::DATE,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE COALESCE(success, FALSE)),
+    COUNT(*) FILTER (WHERE step_type = 'execution' AND app = 'workflow'),
+    COUNT(*) FILTER (WHERE step_type = 'execution' AND app = 'workflow' AND COALESCE(success, FALSE)),
+    COUNT(*) FILTER (WHERE step_type = 'execution' AND app = 'workflow' AND NOT COALESCE(success, FALSE)),
+    MAX(created_at) FILTER (WHERE step_type = 'execution' AND app = 'workflow')
+FROM workflow_execution_logs
+WHERE NOT EXISTS (SELECT 1 FROM workflow_execution_rollups)
+GROUP BY 1, 2, 3;
+
+-- Per user, per workflow totals read by /workflows/analytics
+CREATE OR REPLACE VIEW workflow_execution_totals AS
+SELECT
+    user_id,
+    workflow_id,
+    SUM(actions)::INT AS actions,
+    SUM(successful_actions)::INT AS successful_actions,
+    SUM(executions)::INT AS executions,
+    SUM(successes)::INT AS successes,
+    SUM(failures)::INT AS failures,
+    MAX(last_execution) AS last_execution
+FROM workflow_execution_rollups
+GROUP BY user_id, workflow_id;
+
+-- 8. Google Calendar push notification channels (events.watch), renewed before they expire
+CREATE TABLE IF NOT EXISTS calendar_watch_channels (
+    id TEXT PRIMARY KEY,                         -- channel ID (X-Goog-Channel-ID)
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    calendar_id TEXT NOT NULL DEFAULT 'primary',
+    resource_id TEXT NOT NULL,                   -- needed to stop the channel
+    token TEXT NOT NULL,                         -- echoed back as X-Goog-Channel-Token
+    expires_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- 9. Notion page -> Google Calendar event mappings
+-- Written right after an event is created and checked before inserting, so a failed
+-- Notion update never leads to a duplicate event on the next poll
+CREATE TABLE IF NOT EXISTS notion_event_mappings (
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    notion_page_id TEXT NOT NULL,
+    google_event_id TEXT NOT NULL,
+    content_hash TEXT,                           -- fingerprint of title, dates and attendees
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (user_id, notion_page_id)
 );
 
 -- Insert default workflows
@@ -66,8 +287,17 @@ CREATE INDEX IF NOT EXISTS idx_user_integrations_user_id ON user_integrations(us
 CREATE INDEX IF NOT EXISTS idx_user_integrations_provider ON user_integrations(provider);
 CREATE INDEX IF NOT EXISTS idx_user_workflows_user_id ON user_workflows(user_id);
 CREATE INDEX IF NOT EXISTS idx_user_workflows_workflow_id ON user_workflows(workflow_id);
-CREATE INDEX IF NOT EXISTS idx_workflow_logs_user_id ON workflow_execution_logs(user_id);
 CREATE INDEX IF NOT EXISTS idx_workflow_logs_workflow_id ON workflow_execution_logs(workflow_id);
+-- Keyset pagination of a user's logs on (created_at, id), newest first (also serves user_id lookups);
+-- created on the partitioned table, so every monthly partition gets it
+DROP INDEX IF EXISTS idx_workflow_logs_user_created;
+CREATE INDEX IF NOT EXISTS idx_workflow_logs_user_created_id ON workflow_execution_logs(user_id, created_at DESC, id DESC);
+
+-- Route Notion webhook events to users by database or workspace
+CREATE INDEX IF NOT EXISTS idx_user_integrations_notion_database ON user_integrations((metadata->>'database_id')) WHERE provider = 'notion';
+CREATE INDEX IF NOT EXISTS idx_user_integrations_notion_workspace ON user_integrations((metadata->>'workspace_id')) WHERE provider = 'notion';
+CREATE INDEX IF NOT EXISTS idx_calendar_watch_channels_user_id ON calendar_watch_channels(user_id);
+CREATE INDEX IF NOT EXISTS idx_calendar_watch_channels_expires_at ON calendar_watch_channels(expires_at);
 
 -- Verify the setup
 SELECT 'Tables created successfully' as status;
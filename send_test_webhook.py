@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Notion and Google webhook senders.
+
+    python send_test_webhook.py notion <database_id> [--workspace-id ID] [--type page.properties_updated]
+    python send_test_webhook.py google <channel_id> <channel_token> [--state exists]
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+from app.config import settings
+
+def send_notion_event(base_url: str, database_id: str, workspace_id: str, event_type: str):
+    """Send a signed Notion change event for a page in the database"""
+    payload = {
+        "id": str(uuid.uuid4()),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "workspace_id": workspace_id,
+        "type": event_type,
+        "entity": {"id": str(uuid.uuid4()), "type": "page"},
+        "data": {"parent": {"id": database_id, "type": "database"}}
+    }
+    body = json.dumps(payload).encode()
+    signature = "sha256=" + hmac.new(settings.NOTION_WEBHOOK_VERIFICATION_TOKEN.encode(), body, hashlib.sha256).hexdigest()
+    
+    response = httpx.post(f"{base_url}/webhooks/notion", content=body, headers={
+        "Content-Type": "application/json",
+        "X-Notion-Signature": signature
+    })
+    print(f"{response.status_code} {response.text}")
+
+def send_google_notification(base_url: str, channel_id: str, channel_token: str, state: str):
+    """Send a Google Calendar push notification for a stored watch channel"""
+    response = httpx.post(f"{base_url}/webhooks/google/calendar", headers={
+        "X-Goog-Channel-ID": channel_id,
+        "X-Goog-Channel-Token": channel_token,
+        "X-Goog-Resource-State": state,
+        "X-Goog-Message-Number": str(int(datetime.now(timezone.utc).timestamp() * 1000)),
+        "X-Goog-Resource-ID": "local-test"
+    })
+    print(f"{response.status_code} {response.text}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send test webhooks to a local API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    subparsers = parser.add_subparsers(dest="source", required=True)
+    
+    notion = subparsers.add_parser("notion", help="Signed Notion change event")
+    notion.add_argument("database_id")
+    notion.add_argument("--workspace-id", default=str(uuid.uuid4()))
+    notion.add_argument("--type", default="page.properties_updated")
+    
+    google = subparsers.add_parser("google", help="Google Calendar push notification")
+    google.add_argument("channel_id")
+    google.add_argument("channel_token")
+    google.add_argument("--state", default="exists")
+    
+    args = parser.parse_args()
+    if args.source == "notion":
+        send_notion_event(args.base_url, args.database_id, args.workspace_id, args.type)
+    else:
+        send_google_notification(args.base_url, args.channel_id, args.channel_token, args.state)
@@ -12,8 +12,8 @@ def start_celery_worker():
     print("Starting Celery worker...")
     subprocess.run([
         sys.executable, "-m", "celery", "-A", "app.celery", "worker",
-        "--loglevel=info", "--pool=solo", "--concurrency=1"
-    ])
+        "--loglevel=info"
+    ])  # Pool and concurrency come from CELERY_WORKER_POOL / CELERY_WORKER_CONCURRENCY
 
 def start_celery_beat():
     """Start the Celery beat scheduler"""
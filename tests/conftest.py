@@ -0,0 +1,26 @@
+import httpx
+import pytest
+from app.repository import Repository
+
+class MockRepository(Repository):
+    """
+    Repository on the real postgrest client whose HTTP calls go to a handler
+    instead of a server, so tests see the exact request the client builds.
+    """
+    
+    def __init__(self, handler):
+        self.handler = handler
+        super().__init__("http://postgrest.test", "test-key")
+    
+    def _create_client(self):
+        client = super()._create_client()
+        client.session = httpx.AsyncClient(
+            base_url=client.session.base_url,
+            headers=client.session.headers,
+            transport=httpx.MockTransport(self.handler)
+        )
+        return client
+
+@pytest.fixture
+def mock_repository():
+    return MockRepository
@@ -0,0 +1,63 @@
+import asyncio
+import gzip
+import json
+import re
+import httpx
+from app.config import settings
+from app.utils import log_archive
+
+ROWS = [
+    {"id": 1, "created_at": "2024-01-01T00:00:00+00:00"},
+    {"id": 2, "created_at": "2024-01-02T00:00:00+00:00"},
+    {"id": 3, "created_at": "2024-01-02T00:00:00+00:00"},
+    {"id": 4, "created_at": "2024-01-03T00:00:00+00:00"},
+    {"id": 5, "created_at": "2024-01-04T00:00:00+00:00"},
+]
+CURSOR = re.compile(r'^\(created_at\.gt\."(.+)",and\(created_at\.eq\."(.+)",id\.gt\.(\d+)\)\)$')
+
+def postgrest_handler(requests):
+    """
+    Answer log range queries from ROWS the way PostgREST would.
+    """
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        params = request.url.params
+        assert params["order"] == "created_at,id"
+        start, end = params.get_list("created_at")
+        assert start.startswith("gte.") and end.startswith("lt.")
+        rows = [row for row in ROWS if start[len("gte."):] <= row["created_at"] < end[len("lt."):]]
+        if "or" in params:
+            created_at, same_created_at, log_id = CURSOR.match(params["or"]).groups()
+            assert created_at == same_created_at
+            rows = [
+                row for row in rows
+                if row["created_at"] > created_at or (row["created_at"] == created_at and row["id"] > int(log_id))
+            ]
+        rows.sort(key=lambda row: (row["created_at"], row["id"]))
+        return httpx.Response(200, json=rows[:int(params["limit"])])
+    return handler
+
+def test_archive_partition_pages_past_first_batch(mock_repository, monkeypatch, tmp_path):
+    requests = []
+    repo = mock_repository(postgrest_handler(requests))
+    monkeypatch.setattr(log_archive, "admin_repository", repo)
+    monkeypatch.setattr(log_archive, "ARCHIVE_PAGE_SIZE", 2)
+    monkeypatch.setattr(settings, "LOG_ARCHIVE_DIR", str(tmp_path))
+    partition = {
+        "partition_name": "workflow_execution_logs_2024_01",
+        "range_start": "2024-01-01T00:00:00+00:00",
+        "range_end": "2024-02-01T00:00:00+00:00",
+    }
+    
+    async def run():
+        try:
+            return await log_archive.archive_partition(partition)
+        finally:
+            await repo.close()
+    
+    assert asyncio.run(run()) == len(ROWS)
+    assert len(requests) == 3
+    
+    with gzip.open(tmp_path / "workflow_execution_logs_2024_01.jsonl.gz", "rt", encoding="utf-8") as handle:
+        archived = [json.loads(line) for line in handle]
+    assert [row["id"] for row in archived] == [1, 2, 3, 4, 5]
@@ -0,0 +1,30 @@
+import asyncio
+import httpx
+
+def test_get_logs_cursor_builds_or_filter(mock_repository):
+    requests = []
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=[])
+    
+    repo = mock_repository(handler)
+    cursor = ("2024-05-01T10:00:00+00:00", "42")
+    
+    async def run():
+        try:
+            return await repo.get_logs("user-1", limit=50, before=cursor)
+        finally:
+            await repo.close()
+    
+    assert asyncio.run(run()) == []
+    
+    params = requests[0].url.params
+    assert requests[0].url.path == "/rest/v1/workflow_execution_logs"
+    assert params["user_id"] == "eq.user-1"
+    assert params["or"] == (
+        '(created_at.lt."2024-05-01T10:00:00+00:00",'
+        'and(created_at.eq."2024-05-01T10:00:00+00:00",id.lt.42))'
+    )
+    assert params["order"] == "created_at.desc,id.desc"
+    assert params["limit"] == "50"